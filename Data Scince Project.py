@@ -1,11 +1,14 @@
 # -*- coding: utf-8 -*-
-
+"""
 
 ## CEIT 418 Data Science Project
+
+The data folder and output folder are configurable (`--data-root`/`--output-dir` or the `OULAD_DATA_ROOT`/`OULAD_OUTPUT_DIR` environment variables). Google Drive is only mounted when the notebook runs on Colab; the batch version of the pipeline is `python -m oulad --data-root DIR --output-dir DIR`.
 """
 
-from google.colab import drive
-drive.mount('/content/drive')
+from oulad.config import get_config
+
+config = get_config()
 
 """As your final data science project for CEIT 418, you will explore an educational dataset, and build a classification machine learning model.
 
@@ -45,44 +48,48 @@ import numpy as np
 import pandas as pd
 import seaborn as sns
 import matplotlib.pyplot as plt
-from scipy.stats import f_oneway
+
+from oulad.aggregate import click_rollups, fine_grain
+from oulad.binning import REGISTRATION_TIMING, UNREGISTRATION_TIMING, assign_bins
+from oulad.clicklog import open_click_log
+from oulad.cube import RateCube
+from oulad.encoding import CategoricalEncoder
+from oulad.features import build_click_matrix, engagement_features
+from oulad.figures import draw_activity_result, mean_ci
+from oulad.joins import SiteLookup, merge_checked, reconcile_withdrawals
+from oulad.loader import ENROLMENT_KEY, load_table
+from oulad.model import build_design_matrix, cross_validate
+from oulad.presentation import presentation_semester
+from oulad.quality import format_report, quality_report
+from oulad.stats import RESULT_CLASSES, grouped_anova
+from oulad.windows import DailyClicks
+
+# Folder that contains the OULAD csv files.
+DATA_ROOT = config.data_root
+
+# Row counts of every join, filled by merge_checked.
+join_report = []
 
 """**TASK1:** Identify and treat duplicate/missing values (if there is any).
 
 Loading Data: We start by loading the data into a pandas DataFrame.
-"""
-
-courses_df= pd.read_csv("/content/drive/MyDrive/dataset/courses.csv")
 
-# Displaying the basic information about the DataFrame.
-print("### Info ###")
-print(courses_df.info())
-
-# Displaying summary statistics.
-print("\n### Summary Statistics ###")
-print(courses_df.describe())
+Every table is read with `load_table`, which applies a fixed schema (categorical codes for module/presentation/activity/region, small integers for ids, dates and clicks) and keeps a Parquet copy of the parsed table, so later runs skip the CSV parsing unless the file changed.
+"""
 
-# Checking for duplicate rows.
-duplicate_rows = courses_df[courses_df.duplicated()]
-print("\n### Duplicate Rows ###")
-print(duplicate_rows)
+courses_df = load_table("courses", DATA_ROOT)
 
-# Checking for missing values.
-missing_values = courses_df.isnull().sum()
-print("\n### Missing Values ###")
-print(missing_values)
+# Data types, missing values, summary statistics, cardinality and duplicate rows/keys in one pass.
+# The report is cached next to the data and only recomputed when the csv changes.
+print(format_report(quality_report("courses", DATA_ROOT)))
 
 """**Explanation:**
 
 Exploring Data:
 
-I began by using the info() method to gather essential details about the DataFrame. This included information about data types, non-null counts, and an overall view of the dataset's structure.
-
-Additionally, I employed the describe() method to generate summary statistics specifically for numerical columns. This quick overview provided key statistical measures like mean, standard deviation, and quartiles.
-
-To identify any duplicated rows in the dataset, I utilized the duplicated() method. This step was crucial to determine if there were any replicated observations that needed attention.
+I began by profiling the table with quality_report, which gathers in a single pass what info(), describe(), duplicated() and isnull().sum() would show: the data types, non-null and missing counts and the number of distinct values of every column, summary statistics (minimum, maximum, mean and standard deviation) of the numerical columns, and the number of duplicated rows and of rows repeating a key that should be unique.
 
-To assess the extent of missing data in different columns, I used the isnull().sum() expression. This helped me understand the distribution of missing values across the DataFrame.
+The duplicate check works on integer codes of the columns instead of comparing full rows, and the report is saved next to the data, so rerunning the notebook does not repeat the scan unless the csv file changed.
 
 **Interpretation:**
 
@@ -103,7 +110,7 @@ There are no missing values in any of the columns.
 
 def calculate_courses_stats(df, month_code):
     # Filtering the DataFrame based on the specified start month code.
-    filtered_courses = df[df['code_presentation'].str.endswith(month_code)]
+    filtered_courses = df[presentation_semester(df['code_presentation']) == month_code]
 
     # Calculating the number of courses and the total length for the filtered courses.
     num_courses = len(filtered_courses)
@@ -126,7 +133,7 @@ print(f"Total length of courses started in October: {round(oct_total_length, 2)}
 
 Function Definition (calculate_courses_stats):
 
-I defined a function named calculate_courses_stats that takes two parameters, df (representing a DataFrame) and month_code (indicating the start month). To filter the DataFrame based on the specified start month, I used the str.endswith() method. The function then calculates the number of courses and the total length of these courses for the filtered DataFrame. Finally, the function returns the calculated values.
+I defined a function named calculate_courses_stats that takes two parameters, df (representing a DataFrame) and month_code (indicating the start month). To filter the DataFrame based on the specified start month, I used presentation_semester(), which reads the start month letter at the end of each presentation code (parsing each distinct code once). The function then calculates the number of courses and the total length of these courses for the filtered DataFrame. Finally, the function returns the calculated values.
 
 Function Invocation:
 
@@ -162,45 +169,26 @@ StudentInfo (`studentInfo.csv`) file contains **demographic** information about
 **TASK1:** Identify and treat duplicate/missing values (if there is any)
 """
 
-studentInfo_df= pd.read_csv("/content/drive/MyDrive/dataset/studentInfo.csv")
-
-# Displaying basic information about the DataFrame
-print("### Info ###")
-print(studentInfo_df.info())
-
-# Displaying summary statistics
-print("\n### Summary Statistics ###")
-print(studentInfo_df.describe())
-
-# Checking for duplicate rows
-duplicate_rows_student_info = studentInfo_df[studentInfo_df.duplicated()]
-print("\n### Duplicate Rows ###")
-print(duplicate_rows_student_info)
+studentInfo_df = load_table("studentInfo", DATA_ROOT)
 
-# Checking for missing values
-missing_values_student_info = studentInfo_df.isnull().sum()
-print("\n### Missing Values ###")
-print(missing_values_student_info)
+# Data types, missing values, summary statistics, cardinality and duplicate rows/enrolments in one pass
+print(format_report(quality_report("studentInfo", DATA_ROOT)))
 
 """**Explanation**
 
 Exploring Data:
 
-I began by using the info() method to gather essential details about the DataFrame. This included information about data types, non-null counts, and an overall view of the dataset's structure.
+I began by profiling the table with quality_report, which gathers in a single pass what info(), describe(), duplicated() and isnull().sum() would show: the data types, non-null and missing counts and the number of distinct values of every column, summary statistics (minimum, maximum, mean and standard deviation) of the numerical columns, and the number of duplicated rows and of rows repeating a key that should be unique.
 
-Additionally, I employed the describe() method to generate summary statistics specifically for numerical columns. This quick overview provided key statistical measures like mean, standard deviation, and quartiles.
-
-To identify any duplicated rows in the dataset, I utilized the duplicated() method. This step was crucial to determine if there were any replicated observations that needed attention.
-
-To assess the extent of missing data in different columns, I used the isnull().sum() expression. This helped me understand the distribution of missing values across the DataFrame.
+The duplicate check works on integer codes of the columns instead of comparing full rows, and the report is saved next to the data, so rerunning the notebook does not repeat the scan unless the csv file changed.
 
 **Interpretation:**
 
-The info() output reveals that the DataFrame contains 32,593 entries and 12 columns.
+The quality report reveals that the DataFrame contains 32,593 entries and 12 columns.
 
 Data types include integers (int64) and objects (object), representing a mix of numerical and categorical variables.
 
-The describe() output provides statistical measures for numerical columns:
+Its summary statistics for the numerical columns:
 id_student: Student IDs ranging from 3,733 to 2,716,795.
 
 num_of_prev_attempts: Students attempted courses 0 to 6 times on average.
@@ -365,34 +353,39 @@ Registration table (`studentRegistration.csv`) contains information about the ti
 **TASK1:** As the first task, you need to ensure that there are no conflicts between `studentRegistration.csv` and `studentInfo.csv` dataset in terms of **Withdrawal** status of *unregistered* students. For example, if a student unregistered from a course at some point (which can be found in "studentRegistration.csv"), his/her `final_result` should be **Withdrawal**.
 """
 
-studentRegistration_df= pd.read_csv("/content/drive/MyDrive/dataset/studentRegistration.csv")
+studentRegistration_df = load_table("studentRegistration", DATA_ROOT)
 
-merged_df = pd.merge(studentRegistration_df, studentInfo_df, on=['code_module', 'code_presentation', 'id_student'], how='left')
+merged_df = merge_checked(studentRegistration_df, studentInfo_df, on=ENROLMENT_KEY, how='left', validate='one_to_one',
+                          name='registration x studentInfo', report=join_report)
 
-conflicts = merged_df[(merged_df['date_unregistration'].notnull()) & (merged_df['final_result'] != 'Withdrawal')]
+conflicts = merged_df[(merged_df['date_unregistration'].notnull()) & (merged_df['final_result'] != 'Withdrawn')]
 print(conflicts.head())
 
-studentInfo_df.loc[studentInfo_df['id_student'].isin(conflicts['id_student']), 'final_result'] = 'Withdrawal'
+# Only the conflicting enrolments (matched on module, presentation and student) are set to 'Withdrawn'
+reconciliation = []
+studentInfo_df = reconcile_withdrawals(studentRegistration_df, studentInfo_df, report=reconciliation)
+print(f"Enrolments changed to 'Withdrawn': {reconciliation[0]['changed_rows']}")
 
 """**Explanation:**
 
 I merged the studentRegistration_df with studentInfo_df based on the common columns 'code_module', 'code_presentation', and 'id_student'. This merging allows me to align registration and demographic information for each student across different courses and presentations.
 
-The conflicts DataFrame is then created to identify instances where a student unregistered but still has a final result other than 'Withdrawal'. This situation implies a discrepancy between unregistration and final result status.
+The conflicts DataFrame is then created to identify instances where a student unregistered but still has a final result other than 'Withdrawn' (the value used in the dataset). This situation implies a discrepancy between unregistration and final result status.
+
+reconcile_withdrawals then looks up each unregistered enrolment by its full key ('code_module', 'code_presentation', 'id_student') and changes the final result of the conflicting enrolments only; other enrolments of the same student keep their own result. It also reports how many rows were changed.
 
 **Interpretation:**
 
-The conflicts DataFrame highlights cases where students withdrew (date_unregistration is not null) but have a final result other than 'Withdrawal'. This inconsistency in the data might be due to errors or anomalies in the registration and unregistration process. To address this, I updated the final_result column in studentInfo_df for the corresponding students to 'Withdrawal', ensuring consistency between unregistration and final result status. This correction helps maintain data integrity and coherence.
+The conflicts DataFrame highlights cases where students withdrew (date_unregistration is not null) but have a final result other than 'Withdrawn'. This inconsistency in the data might be due to errors or anomalies in the registration and unregistration process. To address this, I updated the final_result column in studentInfo_df for the corresponding enrolments to 'Withdrawn', ensuring consistency between unregistration and final result status. This correction helps maintain data integrity and coherence.
 
 **TASK2:** Categorize students based on the day they registered for a course. In other words, you need to **bin** the registration data based on the `date_registration` column. Just to illustrate this idea, you can group students into categories such as "Very early birds", "early birds", "in-time", and "late-comers". You can use the categories given in this example or create your own categories.
 """
 
-# Define bins and labels
-bins = [-float('inf'), -120, -60, 0, 60, float('inf')]
-labels = ['Very early birds', 'Early birds', 'In-time', 'Late-comers','Very Late-comers' ]
+# Bins and labels: inner edges -120, -60, 0 and 60 days, the outermost bins are open-ended
+print(REGISTRATION_TIMING)
 
 # Creating a new column 'registration_category' based on bins and labels
-studentRegistration_df['registration_category'] = pd.cut(studentRegistration_df['date_registration'], bins=bins, labels=labels, right=False)
+studentRegistration_df = assign_bins(studentRegistration_df, [REGISTRATION_TIMING])
 
 studentRegistration_df.head()
 
@@ -402,7 +395,7 @@ I defined bins and corresponding labels to categorize students based on the timi
 
 The bin edges are set to [-∞, -120, -60, 0, 60, ∞], representing different time intervals before and after the course start date for registration.
 The labels are assigned as follows: "Very early birds" for registrations more than 120 days before the start date, "Early birds" for registrations between 60 and 120 days, "In-time" for registrations within 60 days, "Late-comers" for registrations within 60 days after the start date, and "Very Late-comers" for registrations more than 60 days after the start date.
-I created a new column named 'registration_category' in the studentRegistration_df DataFrame using the pd.cut function. This column classifies each student's registration timing into one of the defined categories based on the 'date_registration' values.
+I created a new column named 'registration_category' in the studentRegistration_df DataFrame with assign_bins, which finds each day's bin with a binary search over the edges (like pd.cut with right=False). This column classifies each student's registration timing into one of the defined categories based on the 'date_registration' values.
 
 **Interpretation:**
 
@@ -411,12 +404,11 @@ The 'registration_category' column provides a useful categorization of students
 **TASK3:** Categorize students based on the day they *unregistered* a course. In other words, you need to **bin** registration date based on the `date_unregistration` column. You are free to determine the number and the name of the categories (as in Task1).
 """
 
-# Define bins and labels
-bins = [-float('inf'), -60, 0, 60,120, float('inf')]
-labels = ['Very Early unregistration', 'Early unregistration','In-time', 'Lately unregistration', 'Very Lately unregistration']
+# Bins and labels: inner edges -60, 0, 60 and 120 days, the outermost bins are open-ended
+print(UNREGISTRATION_TIMING)
 
-# Creating a new column 'registration_category' based on bins and labels
-studentRegistration_df['unregistration_category'] = pd.cut(studentRegistration_df['date_unregistration'], bins=bins, labels=labels, right=False)
+# Creating a new column 'unregistration_category' based on bins and labels
+studentRegistration_df = assign_bins(studentRegistration_df, [UNREGISTRATION_TIMING])
 studentRegistration_df.head()
 
 """**Explanation:**
@@ -425,7 +417,7 @@ I defined bins and corresponding labels to categorize students based on the timi
 
 The bin edges are set to [-∞, -60, 0, 60, 120, ∞], representing different time intervals before and after the course end date for unregistration.
 The labels are assigned as follows: "Very Early unregistration" for unregistrations more than 60 days before the end date, "Early unregistration" for unregistrations between 0 and 60 days before the end date, "In-time" for unregistrations within 60 days after the end date, "Lately unregistration" for unregistrations within 120 days after the end date, and "Very Lately unregistration" for unregistrations more than 120 days after the end date.
-I created a new column named 'unregistration_category' in the studentRegistration_df DataFrame using the pd.cut function. This column classifies each student's unregistration timing into one of the defined categories based on the 'date_unregistration' values.
+I created a new column named 'unregistration_category' in the studentRegistration_df DataFrame with assign_bins, in the same way as the registration categories. This column classifies each student's unregistration timing into one of the defined categories based on the 'date_unregistration' values.
 
 **Interpretation:**
 
@@ -435,27 +427,34 @@ The 'unregistration_category' column provides a useful categorization of student
 """
 
 # Merging dataframes on common columns.
-merged_df = pd.merge(studentInfo_df, studentRegistration_df, on=['code_module', 'code_presentation', 'id_student'], how='left')
+merged_df = merge_checked(studentInfo_df, studentRegistration_df, on=ENROLMENT_KEY, how='left', validate='one_to_one',
+                          name='studentInfo x registration', report=join_report)
 
 # Choosing three demographic variables.
 chosen_demographic_vars = ['highest_education', 'region', 'disability']
 
+# Counting enrolments, registrations and unregistrations once per combination of all demographic variables
+# and the final result; the rates of any variable (or combination of variables) are sums over this cube.
+rate_cube = RateCube.from_frame(merged_df)
+
 # Exploring relationship for each chosen demographic variable.
 for var in chosen_demographic_vars:
+    rates = rate_cube.rates(var)
+
     # Calculating registration rates for each category.
-    registration_rates = merged_df.groupby(var)['date_registration'].count() / studentInfo_df.groupby(var)['id_student'].count()
-    print(f"\nRegistration Rates based on {var}:\n{registration_rates}")
+    print(f"\nRegistration Rates based on {var}:\n{rates['registration_rate']}")
 
     # Calculating unregistration rates for each category.
-    unregistration_rates = merged_df.groupby(var)['date_unregistration'].count() / studentInfo_df.groupby(var)['id_student'].count()
-    print(f"\nUnregistration Rates based on {var}:\n{unregistration_rates}")
+    print(f"\nUnregistration Rates based on {var}:\n{rates['unregistration_rate']}")
 
 """**Explanation:**
 
-I merged the studentInfo_df and studentRegistration_df DataFrames based on common columns ('code_module', 'code_presentation', 'id_student') using the pd.merge function.
+I merged the studentInfo_df and studentRegistration_df DataFrames based on common columns ('code_module', 'code_presentation', 'id_student') using merge_checked, which also verifies that each enrolment appears only once on both sides.
 
 I selected three demographic variables ('highest_education', 'region', 'disability') to explore their relationship with registration and unregistration rates.
 
+Rather than grouping the merged table again for every variable, I counted the enrolments, registrations and unregistrations once for every combination of the demographic variables and the final result (rate_cube). The rates for a variable are then sums over this much smaller table, so other variables, or combinations such as gender and region, can be explored without going back to the merged data.
+
 For each chosen demographic variable, I calculated registration rates and unregistration rates
 
 Highest Education:
@@ -535,12 +534,10 @@ Course components table (`moodle.csv`) contains information about the available
 **TASK1:** In this dataset, some columns contain mainly missing values. Detect them and drop them to save space in the memory.
 """
 
-moodle_df = pd.read_csv("/content/drive/MyDrive/dataset/moodle.csv")
+moodle_df = load_table("moodle", DATA_ROOT)
 
-# Checking for missing values
-missing_values_student_info = moodle_df.isnull().sum()
-print("\n### Missing Values ###")
-print(missing_values_student_info)
+# Checking for missing values (the nulls column of the quality report)
+print(format_report(quality_report("moodle", DATA_ROOT)))
 # Dropping rows with missing values
 moodle_df = moodle_df.dropna()
 
@@ -549,7 +546,7 @@ moodle_df = moodle_df.reset_index(drop=True)
 
 """**Explanation:**
 
-I checked for missing values in the studentInfo_df DataFrame using the isnull().sum() method, which provides the count of missing values for each column.
+I checked for missing values in the moodle_df DataFrame using the nulls column of the quality report, which provides the count of missing values for each column.
 
 I used the dropna() method to remove rows containing missing values from the DataFrame.
 
@@ -569,7 +566,7 @@ top_comp = moodle_df['activity_type'].value_counts().nlargest(5).index
 top_comp_df = moodle_df[moodle_df['activity_type'].isin(top_comp)]
 
 # Create a new table that displays how many times each of these popular components were included in each offering
-popular_components_table = pd.pivot_table(top_comp_df, values='id_site', index=['code_module', 'code_presentation'], columns='activity_type', aggfunc='count', fill_value=0)
+popular_components_table = pd.pivot_table(top_comp_df, values='id_site', index=['code_module', 'code_presentation'], columns='activity_type', aggfunc='count', fill_value=0, observed=True)
 
 # Display the table
 popular_components_table
@@ -608,10 +605,23 @@ Student activity data (`studentMoodleInteract.csv`) contains information about e
 **TASK1:** Display the total number of clicks for each course per each semester delivered. Besides a textual output, some visualizations must be provided for helping to interpret the data.
 """
 
-studentMoodleInteract_df = pd.read_csv("/content/drive/MyDrive/dataset/studentMoodleInteract.csv")
+# Memory-mapped column store of the click log; aggregations read it block by block.
+click_log = open_click_log(DATA_ROOT)
+
+# Missing values, value ranges and duplicate rows/(student, site, day) keys of the click log, computed once and cached.
+print(format_report(quality_report("studentMoodleInteract", DATA_ROOT)))
+
+# activity_type of every course component, looked up by id_site.
+moodleDf = load_table("moodle", DATA_ROOT)
+activity_lookup = SiteLookup(moodleDf)
+
+# One pass over the click log: total/count/mean clicks per student, course, presentation and activity type.
+# All the click tables of this section are derived from this (much smaller) table.
+fine_clicks = fine_grain(click_log, activity_lookup)
+rollups = click_rollups(fine_clicks)
 
 # Display the total number of clicks for each course per each semester delivered
-total_clicks_per_course_semester = studentMoodleInteract_df.groupby(['code_module', 'code_presentation'])['sum_click'].sum().reset_index()
+total_clicks_per_course_semester = rollups['total_clicks_per_course_semester']
 
 # Display the textual output
 print(total_clicks_per_course_semester)
@@ -627,7 +637,7 @@ plt.show()
 
 """**Explanation:**
 
-I used groupby on the 'code_module' and 'code_presentation' columns of the studentMoodleInteract_df DataFrame, followed by sum() to calculate the total number of clicks for each course in each semester.
+I summed the clicks per 'code_module' and 'code_presentation' to calculate the total number of clicks for each course in each semester. Rather than loading the click log into a DataFrame, I aggregated the memory-mapped copy of it (click_log) once to total clicks per student, course, presentation and activity type (fine_clicks); this table and the ones in the following tasks are derived from that aggregate, so the click log is scanned only once.
 
 The resulting DataFrame, total_clicks_per_course_semester, displays the total clicks for each course and semester.
 
@@ -642,11 +652,8 @@ The plot can be useful for identifying trends or variations in student interacti
 **TASK2**: As a follow up to the first task, identify the courses in which the total number of clicks is higher in 2014 than 2013. If the course was taught two times in the same year (such as, 2013B and 2013J) use the average of both semesters (`(2013B+2013J)/2`) to compare with the other year.
 """
 
-# Extract the year from the 'code_presentation' column and create a new 'year' column
-studentMoodleInteract_df['year'] = studentMoodleInteract_df['code_presentation'].apply(lambda x: int(x[:4]))
-
-# Calculate the average clicks for each course in each year
-average_clicks_per_course_year = studentMoodleInteract_df.groupby(['code_module', 'year'])['sum_click'].mean().reset_index()
+# Calculate the average clicks for each course in each year (the year is taken from 'code_presentation')
+average_clicks_per_course_year = rollups['average_clicks_per_course_year']
 
 # Identify the courses where the total number of clicks is higher in 2014 than 2013
 courses_higher_in_2014 = average_clicks_per_course_year.pivot(index='code_module', columns='year', values='sum_click')
@@ -658,9 +665,9 @@ print(courses_higher_in_2014)
 
 """**Explanation:**
 
-I created a new 'year' column based on the 'code_presentation' column.
+I took the year from the 'code_presentation' column.
 
-I calculated the average clicks for each course in each year.
+I calculated the average clicks for each course in each year as the total clicks divided by the number of click records, both taken from the aggregated click table.
 
 I identified the courses where the total number of clicks is higher in 2014 than 2013.
 
@@ -673,19 +680,17 @@ The output indicates that for the course with the code_module 'BBB', the average
 **TASK3:** Which type of resources were mostly clicked by the students? Do you observe a common pattern accross courses (e.g., in almost all courses, clicks on `resource` is  higher than `quiz`)? A heatmap as a visualization might be helpful here.
 """
 
-moodleDf= pd.read_csv("/content/drive/MyDrive/dataset/moodle.csv")
-merged_df = pd.merge(studentMoodleInteract_df, moodleDf[['id_site','activity_type']], on='id_site', how='left')
-
-clicks_by = merged_df.groupby(['activity_type', 'code_module'])['sum_click'].sum().reset_index()
+# Total clicks per activity type and module
+clicks_by = rollups['clicks_by']
 
 table = clicks_by.pivot(index='activity_type', columns='code_module', values='sum_click').fillna(0)
 table
 
 """**Explanation:**
 
-I started by loading the Moodle data from a CSV file and then merging it with the studentMoodleInteract_df DataFrame based on the 'id_site' column. This merge was essential to associate each student interaction with its corresponding activity type.
+I started by loading the Moodle data from a CSV file and then attaching its 'activity_type' to the click log based on the 'id_site' column (activity_lookup in TASK1). This join was essential to associate each student interaction with its corresponding activity type. Since 'id_site' is a small integer key, the join is done with a lookup array indexed by 'id_site' instead of a full merge, which would copy every click column; clicks on sites missing from moodle get NaN, as with a left merge.
 
-Next, I grouped the resulting DataFrame (merged_df) by both 'activity_type' and 'code_module.' The goal was to calculate the total number of clicks ('sum_click') for each combination of activity type and module, shedding light on the popularity of various resources.
+Next, I grouped the aggregated clicks (fine_clicks) by both 'activity_type' and 'code_module.' The goal was to calculate the total number of clicks ('sum_click') for each combination of activity type and module, shedding light on the popularity of various resources.
 
 **Interpretation:**
 
@@ -703,18 +708,18 @@ This breakdown provides valuable insights into student behavior, indicating whic
 Note that, in this task you actually create some features that can be used for predictive modeling.
 """
 
-# Group by student, course, presentation, and activity type, then calculate the sum of clicks
-clicks_by_activity = merged_df.groupby(['id_student', 'code_module', 'code_presentation', 'activity_type'])['sum_click'].sum().reset_index()
+# Sum of clicks by student, course, presentation, and activity type (clicks on unknown components left out)
+clicks_by_activity = rollups['clicks_by_activity']
 
 # Pivot the DataFrame to create the desired format
-pivot_clicks = clicks_by_activity.pivot_table(index=['id_student', 'code_module', 'code_presentation'], columns='activity_type', values='sum_click', fill_value=0).reset_index()
+pivot_clicks = rollups['pivot_clicks']
 
 # Display the resulting DataFrame
 pivot_clicks
 
 """**Explanation:**
 
-I grouped the data by 'id_student', 'code_module', 'code_presentation', and 'activity_type', calculating the total clicks for each combination.
+I grouped the data by 'id_student', 'code_module', 'code_presentation', and 'activity_type', calculating the total clicks for each combination. This is exactly the grain of fine_clicks from TASK1, so only the rows with a known activity type had to be kept.
 
 The grouped data was then pivoted, creating a table where rows represent unique student-course-presentation combinations, and columns represent different activity types with total click counts.
 
@@ -727,35 +732,37 @@ The structured table offers a detailed view of student interactions. Each row re
 **TASK5:** Using proper visualizations and statistical analysis, please explore if there is any relationship between students' course performance (`final_result` column in `studentInfo.csv`) and clicks on different resources.
 """
 
-# Merging studentInfo_df and merged_df on common columns
-final_merged_df = pd.merge(clicks_by_activity, studentInfo_df[['id_student','final_result']], how='left', on='id_student')
+# Merging clicks_by_activity and studentInfo_df on the enrolment (module, presentation, student), so each
+# enrolment's clicks get the final result of that enrolment only.
+final_merged_df = merge_checked(clicks_by_activity, studentInfo_df[ENROLMENT_KEY + ['final_result']], on=ENROLMENT_KEY,
+                                how='left', validate='many_to_one', name='clicks_by_activity x studentInfo',
+                                report=join_report)
+
+# Row counts of every join so far
+print(pd.DataFrame(join_report).to_string())
 
-# Creating a bar plot
+# Creating a bar plot of the mean clicks; the 95% confidence intervals are computed once per bar
+# (t distribution) instead of bootstrapping over every row of final_merged_df
 plt.figure(figsize=(12, 6))
-sns.barplot(x='activity_type', y='sum_click', hue='final_result', data=final_merged_df)
-plt.title('Average Clicks on Different Resources by Final Result')
-plt.xlabel('Activity Type')
-plt.ylabel('Average Clicks')
-plt.xticks(rotation=45, ha='right')
-plt.legend(title='Final Result')
+draw_activity_result(plt.gca(), mean_ci(final_merged_df, 'activity_type', 'final_result', 'sum_click'))
 plt.show()
 
-#ANOVA test
-for activity_type in final_merged_df['activity_type'].unique():
-    f_statistic, p_value = f_oneway(
-        final_merged_df[final_merged_df['activity_type'] == activity_type]['sum_click'][final_merged_df['final_result'] == 'Distinction'],
-        final_merged_df[final_merged_df['activity_type'] == activity_type]['sum_click'][final_merged_df['final_result'] == 'Pass'],
-        final_merged_df[final_merged_df['activity_type'] == activity_type]['sum_click'][final_merged_df['final_result'] == 'Fail']
-    )
-    print(f"ANOVA for {activity_type}: F-statistic={f_statistic}, p-value={p_value}")
+#ANOVA test (Distinction, Pass, Fail and Withdrawn), computed for all activity types at once
+anova_results = grouped_anova(final_merged_df, group='activity_type', by='final_result', value='sum_click', levels=RESULT_CLASSES)
+for activity_type, row in anova_results.iterrows():
+    print(f"ANOVA for {activity_type}: F-statistic={row['statistic']}, p-value={row['p_value']}")
+
+# Kruskal-Wallis test as a check that does not assume normally distributed clicks
+kruskal_results = grouped_anova(final_merged_df, group='activity_type', by='final_result', value='sum_click', levels=RESULT_CLASSES, method='kruskal')
+print(kruskal_results[['statistic', 'p_value']])
 
 """**Explanation:**
 
-I merged the clicks_by_activity DataFrame, which contains information about student interactions, with the studentInfo_df DataFrame based on the common column 'id_student.' This merge was essential to associate each student's interaction data with their final result.
+I merged the clicks_by_activity DataFrame, which contains information about student interactions, with the studentInfo_df DataFrame based on the enrolment key ('code_module', 'code_presentation', 'id_student'). This merge was essential to associate each student's interaction data with their final result. Joining on 'id_student' alone would attach the results of all of a student's enrolments to each of their enrolments, multiplying rows; the merge is checked to be many-to-one, so the number of rows stays the same as in clicks_by_activity.
 
 After merging, I created a bar plot to visualize the average clicks on different resources grouped by the final result. This allows for a quick comparison of how student engagement with various resources relates to their final results.
 
-To statistically evaluate the significance of the observed differences in average clicks among final result categories for each activity type, I conducted an Analysis of Variance (ANOVA) test. The ANOVA test helps determine if there are any statistically significant differences in means among the final result groups.
+To statistically evaluate the significance of the observed differences in average clicks among final result categories for each activity type, I conducted an Analysis of Variance (ANOVA) test. The ANOVA test helps determine if there are any statistically significant differences in means among the final result groups. The test compares all four final result classes (Distinction, Pass, Fail and Withdrawn), and is computed for every activity type at once from the per-group counts, means and variances. Since click counts are heavily skewed, I also ran the rank-based Kruskal-Wallis test as a check.
 
 **Interpretation:**
 
@@ -781,10 +788,14 @@ In Section 1.2, you explored demographic data about students and tuned some cate
 """
 
 # Specifying the categorical columns
-categorical_columns = ['highest_education','final_result','gender', 'region','disability']
+categorical_columns = ['highest_education', 'gender', 'region', 'disability', 'imd_band', 'age_band']
+
+# Fitting the encoder once: it stores the categories of every column, so the same dummy columns (in the same order)
+# are produced for any subset of students, e.g. cross-validation folds or new students to be scored.
+demographic_encoder = CategoricalEncoder(categorical_columns).fit(studentInfo_df)
 
 # Generating dummy variables
-dummy_variables = pd.get_dummies(studentInfo_df[categorical_columns])
+dummy_variables = demographic_encoder.transform_frame(studentInfo_df)
 
 # Concatenating dummy variables with the original DataFrame
 studentInfo_df = pd.concat([studentInfo_df, dummy_variables], axis=1)
@@ -794,9 +805,9 @@ studentInfo_df
 
 """**Explanation:**
 
-I identified categorical columns that need to be transformed into dummy variables. These columns include 'highest_education,' 'final_result,' 'gender,' 'region,' and 'disability.'
+I identified categorical columns that need to be transformed into dummy variables. These columns include 'highest_education,' 'gender,' 'region,' 'disability,' 'imd_band,' and 'age_band.' 'final_result' is not included since it is the variable the model predicts.
 
-I utilized the pd.get_dummies() function to convert the specified categorical columns into dummy/indicator variables. This process helps in representing categorical data numerically.
+I used a CategoricalEncoder, fitted once on studentInfo_df, to convert the specified categorical columns into dummy/indicator variables. This process helps in representing categorical data numerically. Unlike pd.get_dummies(), the encoder remembers the categories it was fitted on, so it always produces the same columns in the same order, and it can be saved and reused when scoring new students.
 
 The generated dummy variables were concatenated with the original studentInfo_df DataFrame using pd.concat(). This step expands the DataFrame with new columns, each representing a category within the original categorical columns.
 
@@ -817,18 +828,22 @@ Additionally, you should create *at least* **3** features indicating the engagem
 There is no limit in the type and number of additional feature you can generate from the click data.
 """
 
-# Creating a dummy variable indicating if students clicked at least three types of course components
-pivot_clicks['at_least_three_components'] = (pivot_clicks.iloc[:, 3:] > 0).sum(axis=1) >= 3
+# Sparse student-enrolment x activity type click matrix (same rows and columns as pivot_clicks)
+click_matrix, click_enrolments, click_activities = build_click_matrix(clicks_by_activity)
 
-#Calculating each student's average number of clicks across all components per single course and semester
-pivot_clicks['average_clicks'] = pivot_clicks.iloc[:, 3:].mean(axis=1)
+# Number of component types clicked (non-zeros per row) and average clicks over all components (row sum / number of types):
+# at_least_three_components: students clicked at least three types of course components
+# average_clicks: each student's average number of clicks across all components per single course and semester
+# clicked_all_components: students clicked all types of course components
+engagement = engagement_features(click_matrix, click_enrolments)
 
-#Creating dummy variable indicating if students clicked all types of course components
-pivot_clicks['clicked_all_components'] = (pivot_clicks.iloc[:, 3:] > 0).all(axis=1)
+pivot_clicks = pivot_clicks.merge(engagement.drop(columns='n_components'), on=['id_student', 'code_module', 'code_presentation'])
 pivot_clicks
 
 """**Explanation:**
 
+I stored the clicks per activity type as a sparse matrix (click_matrix) with one row per student enrolment and one column per activity type, since most students click only a few of the types. All three features are computed from the number of non-zero entries and the sum of each row, using only the activity type columns.
+
 I introduced a new feature, at_least_three_components, to identify whether students engaged with a diverse range of course components. This was achieved by checking if a student had clicked on at least three types of course components.
 
 To gauge the overall engagement of each student with the course materials, I calculated the average_clicks feature. This represents the mean number of clicks across all course components for a single course and semester.
@@ -849,6 +864,19 @@ Clicked All Components:
 
 The clicked_all_components variable being 'True' indicates students who explored every type of course component, while 'False' signifies those who did not. This information aids in recognizing students with comprehensive resource utilization.
 
+The features above use the whole presentation. For early warning, the same clicks can be cut off at a given day of the course so that only the clicks a tutor would already have seen are used:
+"""
+
+# Daily clicks per enrolment; each cutoff day is answered with searchsorted over cumulative sums.
+# Every enrolment of studentInfo_df gets a row, with zero activity if it never clicked.
+daily_clicks = DailyClicks.from_clicks(click_log, studentInfo_df)
+early_engagement = daily_clicks.features_by_cutoff([0, 30, 60, 90])
+early_engagement[30]
+
+"""**Explanation:**
+
+early_engagement holds one table per cutoff day (0, 30, 60 and 90) with a row for every enrolment, including those without any clicks. Each contains the cumulative clicks up to the earlier checkpoint days and up to the cutoff, the clicks and active days in the last 7 and 14 days before the cutoff, and the days since the last click. Clicks after the cutoff are never used, so a model can be trained for each cutoff day.
+
 ### 2.3. Training and Testing the Model
 
 As the last activity in this project, you are expected to train and test a logistic regression model for predicting students' final course status. You should use 10-fold cross-validation.
@@ -860,3 +888,43 @@ Please note that the achieving low/high accuracy in the predictions has no impor
 
 
 
+
+# Design matrix: the demographic dummy variables from Section 2.1, the clicks per activity type and the engagement
+# features from Section 2.2, as one sparse matrix. Enrolments without any click get zero click features.
+X, y, feature_names = build_design_matrix(studentInfo_df, demographic_encoder, click_matrix, click_enrolments, click_activities)
+
+# Logistic regression with 10-fold cross-validation; the folds are fitted in parallel, one process per core.
+cv_results = cross_validate(X, y, feature_names, n_splits=10)
+
+print("### Confusion Matrix (out-of-fold predictions of all 10 folds) ###")
+print(cv_results['confusion_matrix'])
+
+print("\n### One-vs-rest AUC ###")
+print(cv_results['auc'])
+
+print("\n### One-vs-rest AUC per fold ###")
+print(cv_results['fold_auc'])
+
+# Average absolute (standardized) coefficient of each feature over all classes and folds.
+feature_importance = cv_results['coefficients'].abs().mean().sort_values(ascending=False)
+print("\n### Features with high predictive power ###")
+print(feature_importance.head(10))
+print("\n### Features with low predictive power ###")
+print(feature_importance.tail(10))
+
+"""**Explanation:**
+
+I combined the demographic dummy variables from Section 2.1 with the click features from Section 2.2 (clicks per activity type, number of component types clicked, average clicks, and the two component dummies) into one design matrix with a row per student enrolment. No final_result dummy variables are used: they would encode the outcome we are trying to predict, letting the model read the answer from its input.
+
+The click features are kept as a sparse matrix since most students click only a few component types. Features are standardized inside each fold (without centering, so the matrix stays sparse) before fitting a logistic regression.
+
+For 10-fold cross-validation, the enrolments are split into 10 stratified folds, so each fold has the same mix of final results. Each fold's model is trained on the other nine folds and tested on the held-out fold. The 10 folds are independent, so they are trained in parallel.
+
+**Interpretation:**
+
+The confusion matrix adds up the held-out predictions of all folds: the diagonal shows correctly classified enrolments for each final result, and the off-diagonal cells show which results are confused with each other.
+
+The one-vs-rest AUC measures, for each final result, how well the predicted probabilities separate that result from all others (0.5 is chance level, 1.0 is perfect separation). The per-fold AUCs show how stable this is across folds.
+
+Features with large average absolute coefficients have high predictive power (since features are standardized, their coefficients are comparable), while features with coefficients close to zero contribute little to the predictions.
+"""
@@ -0,0 +1,74 @@
+"""Benchmark: attaching activity_type to the click log with pd.merge vs SiteLookup.
+
+Usage: python benchmarks/bench_activity_join.py [--rows N]
+
+Builds an OULAD-shaped click table (about 6k moodle sites, 20 activity types, a few
+clicks on unknown sites) and reports wall time and peak traced memory of both joins.
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from oulad.joins import SiteLookup  # noqa: E402
+
+
+def make_tables(rows, sites=6000, activities=20, seed=0):
+    rng = np.random.default_rng(seed)
+    id_site = np.sort(rng.choice(np.arange(500_000, 1_100_000), sites, replace=False)).astype('int32')
+    moodle = pd.DataFrame({
+        'id_site': id_site,
+        'activity_type': pd.Categorical.from_codes(
+            rng.integers(0, activities, sites), categories=[f'activity{i:02d}' for i in range(activities)]),
+    })
+    click_sites = id_site[rng.integers(0, sites, rows)]
+    click_sites[rng.random(rows) < 0.001] = 1_200_000  # sites missing from moodle
+    clicks = pd.DataFrame({
+        'code_module': pd.Categorical.from_codes(rng.integers(0, 7, rows), categories=list('ABCDEFG')),
+        'code_presentation': pd.Categorical.from_codes(
+            rng.integers(0, 4, rows), categories=['2013B', '2013J', '2014B', '2014J']),
+        'id_student': rng.integers(0, 2_700_000, rows).astype('int32'),
+        'id_site': click_sites,
+        'date': rng.integers(-25, 270, rows).astype('int16'),
+        'sum_click': rng.zipf(2.0, rows).clip(1, 6000).astype('int16'),
+    })
+    return clicks, moodle
+
+
+def measure(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    args = parser.parse_args(argv)
+
+    clicks, moodle = make_tables(args.rows)
+    merged, merge_time, merge_peak = measure(
+        lambda: pd.merge(clicks, moodle[['id_site', 'activity_type']], on='id_site', how='left'))
+    lookup, build_time, _ = measure(lambda: SiteLookup(moodle))
+    attached, take_time, take_peak = measure(lambda: lookup.attach(clicks))
+
+    pd.testing.assert_frame_equal(merged, attached)
+    print(f'rows: {args.rows:,}')
+    print(f'pd.merge        {merge_time:8.3f} s  peak {merge_peak / 2**20:8.1f} MiB')
+    print(f'SiteLookup.take {take_time:8.3f} s  peak {take_peak / 2**20:8.1f} MiB'
+          f'  (+{build_time * 1000:.1f} ms to build the lookup)')
+
+
+if __name__ == '__main__':
+    main()
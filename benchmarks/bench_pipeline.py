@@ -0,0 +1,79 @@
+"""Benchmark: every pipeline stage on synthetic OULAD data at several scales.
+
+Usage: python benchmarks/bench_pipeline.py [--scale 1 10 100] [--data-dir DIR] [--repeat N] [--report FILE]
+
+For each scale a synthetic dataset (``oulad.synthetic``; 1 = the real click volume) is
+written to ``<data-dir>/scale-<scale>`` unless it is already there. The pipeline is then
+run ``--repeat`` times: the first run is cold (csv parsing, Parquet cache and click store
+build), later runs are warm. The per-stage wall time, CPU time, peak memory growth and
+row counts of every run, plus the windowed features and the ANOVA of Section 1.5, are
+printed and written to one csv report that can be compared across commits. Each run
+happens in a fresh process so that its memory figures are its own.
+"""
+
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from oulad import pipeline  # noqa: E402
+from oulad.clicklog import open_click_log  # noqa: E402
+from oulad.loader import load_table  # noqa: E402
+from oulad.profiling import StageProfiler  # noqa: E402
+from oulad.stats import RESULT_CLASSES, grouped_anova  # noqa: E402
+from oulad.synthetic import write_dataset  # noqa: E402
+from oulad.windows import DailyClicks  # noqa: E402
+
+
+def dataset(data_dir, scale, seed=0):
+    """Folder of the synthetic dataset for ``scale``, generated on first use."""
+    path = os.path.join(data_dir, f'scale-{scale:g}')
+    if not os.path.exists(os.path.join(path, 'studentMoodleInteract.csv')):
+        write_dataset(path, scale, seed)
+    return path
+
+
+def run_once(data_root, n_jobs=None):
+    profiler = StageProfiler()
+    outputs = pipeline.run(data_root, n_jobs=n_jobs, profiler=profiler)
+    with profiler.stage('windows', outputs['final_merged']) as s:
+        daily = DailyClicks.from_clicks(open_click_log(data_root), load_table('studentInfo', data_root))
+        s.output(daily.features_by_cutoff([0, 30, 60, 90]))
+    with profiler.stage('grouped_anova', outputs['final_merged']) as s:
+        s.output(grouped_anova(outputs['final_merged'], levels=RESULT_CLASSES))
+    return profiler.report()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', type=float, nargs='+', default=[1.0])
+    parser.add_argument('--data-dir', default='bench-data', help='folder for the generated datasets')
+    parser.add_argument('--repeat', type=int, default=2, help='pipeline runs per scale (the first is cold)')
+    parser.add_argument('--jobs', type=int, help='shard the pipeline over this many processes')
+    parser.add_argument('--report', default='bench_pipeline.csv')
+    args = parser.parse_args(argv)
+
+    reports = []
+    for scale in args.scale:
+        data_root = dataset(args.data_dir, scale)
+        shutil.rmtree(os.path.join(data_root, '.cache'), ignore_errors=True)
+        for run in range(args.repeat):
+            # A fresh process per run, so peak RSS growth is not hidden by earlier runs.
+            with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as executor:
+                report = executor.submit(run_once, data_root, args.jobs).result()
+            report.insert(0, 'run', run)
+            report.insert(0, 'scale', scale)
+            reports.append(report)
+            print(report.to_string(index=False, float_format=lambda x: f'{x:.3f}'))
+    pd.concat(reports, ignore_index=True).to_csv(args.report, index=False)
+    print(f'report: {args.report}')
+
+
+if __name__ == '__main__':
+    main()
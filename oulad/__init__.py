@@ -0,0 +1 @@
+"""Helpers for loading and processing the OULAD tables used in the CEIT 418 project."""
@@ -0,0 +1,48 @@
+"""Command line entry point: ``python -m oulad --data-root DIR --output-dir DIR``."""
+
+import os
+import sys
+
+from oulad import pipeline
+from oulad.config import get_config
+from oulad.figures import figure_tables, render_figures
+from oulad.profiling import StageProfiler
+from oulad.stages import StageCache
+
+PROFILE_DIR = 'profile'
+STAGE_CACHE_DIR = 'stages'
+FIGURES_DIR = 'figures'
+
+
+def main(argv=None):
+    config = get_config(argv, strict=True)
+    if config.check_sharding:
+        mismatches = pipeline.check_sharding(config.data_root, n_jobs=config.jobs or -1,
+                                             cache_dir=config.cache_dir, use_cache=not config.no_cache)
+        print('sharded and unsharded outputs differ: ' + ', '.join(mismatches) if mismatches
+              else 'sharded and unsharded outputs are equal')
+        return 1 if mismatches else 0
+    profile_dir = os.path.join(config.output_dir, PROFILE_DIR)
+    profiler = StageProfiler(config.profile_stage, profile_dir)
+    stage_cache = None
+    if not config.no_cache:
+        stage_cache = StageCache(os.path.join(config.cache_dir or os.path.join(config.data_root, '.cache'),
+                                              STAGE_CACHE_DIR), config.stage_cache_mib * 2 ** 20)
+    outputs = pipeline.run(config.data_root, cache_dir=config.cache_dir, use_cache=not config.no_cache,
+                           model_dir=config.model_dir, n_jobs=config.jobs, profiler=profiler,
+                           stream=config.stream, chunksize=config.chunksize, backend=config.backend,
+                           stage_cache=stage_cache)
+    with profiler.stage('write_outputs', outputs):
+        paths = pipeline.write_outputs(outputs, config.output_dir)
+    if config.figures:
+        with profiler.stage('figures', outputs['final_merged']):
+            tables = figure_tables(outputs['studentInfo'], outputs['total_clicks_per_course_semester'],
+                                   outputs['final_merged'])
+            paths += render_figures(tables, os.path.join(config.output_dir, FIGURES_DIR), n_jobs=config.jobs or -1)
+    for path in paths + profiler.write_report(profile_dir):
+        print(path)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
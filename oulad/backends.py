@@ -0,0 +1,259 @@
+"""Interchangeable engines for the pipeline's relational steps.
+
+The pipeline needs four table operations: the studentInfo x studentRegistration
+merge, the moodle join of the click log, the Section 1.5 click rollups and the
+final_result join. A backend implements them and always returns pandas DataFrames:
+
+- ``PandasBackend`` runs them eagerly with the existing helpers (Parquet cache,
+  memory-mapped click store, ``SiteLookup``, ``merge_checked``).
+- ``DuckDBBackend`` expresses them as lazy DuckDB queries over the csv files. Only the
+  columns a query uses are parsed, filters are pushed into the scan, and the scan, join
+  and aggregation run on all cores. Results are converted back to the dtypes, category
+  dictionaries and row order of the pandas backend, so the two can be swapped;
+  ``check_backends`` (``python -m oulad.backends --data-root DIR``) verifies that.
+"""
+
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+from pandas.errors import MergeError
+
+from oulad.aggregate import FINE_KEY, PIVOT_KEY, click_rollups, fine_grain
+from oulad.clicklog import open_click_log
+from oulad.joins import SiteLookup, merge_checked
+from oulad.loader import ENROLMENT_KEY, SCHEMAS, load_table, table_path
+
+try:
+    import duckdb
+    HAVE_DUCKDB = True
+except ImportError:
+    HAVE_DUCKDB = False
+
+REGISTRATION_DATES = ['date_registration', 'date_unregistration']
+
+# Column types DuckDB parses the csv files with, derived from the pandas schemas.
+SQL_TYPES = {
+    'category': 'VARCHAR',
+    'str': 'VARCHAR',
+    'int8': 'TINYINT',
+    'Int8': 'TINYINT',
+    'int16': 'SMALLINT',
+    'Int16': 'SMALLINT',
+    'int32': 'INTEGER',
+}
+
+
+class PandasBackend:
+    """Eager pandas implementation (the reference the other backends are checked against)."""
+
+    name = 'pandas'
+
+    def __init__(self, data_root, cache_dir=None, use_cache=True):
+        self.data_root = data_root
+        self.cache_dir = cache_dir
+        self.use_cache = use_cache
+
+    def merge_registration(self, student_info, registration):
+        """studentInfo with each enrolment's registration dates (one_to_one left join)."""
+        return merge_checked(student_info, registration[ENROLMENT_KEY + REGISTRATION_DATES], on=ENROLMENT_KEY,
+                             how='left', validate='one_to_one', name='studentInfo x registration')
+
+    def fine_grain(self):
+        """Per (student, module, presentation, activity) clicks, joined with moodle."""
+        lookup = SiteLookup(load_table('moodle', self.data_root, self.cache_dir, self.use_cache))
+        return fine_grain(open_click_log(self.data_root, self.cache_dir), lookup)
+
+    def click_rollups(self):
+        """The Section 1.5 tables of ``oulad.aggregate.click_rollups``."""
+        return click_rollups(self.fine_grain())
+
+    def clicks_with_result(self, clicks_by_activity, student_info):
+        """Section 1.5 TASK5: attach each enrolment's final_result to its activity clicks."""
+        return merge_checked(clicks_by_activity, student_info[ENROLMENT_KEY + ['final_result']], on=ENROLMENT_KEY,
+                             how='left', validate='many_to_one', name='clicks_by_activity x studentInfo')
+
+
+def _csv_scan(path, table):
+    columns = ', '.join(f"'{col}': '{SQL_TYPES[dtype]}'" for col, dtype in SCHEMAS[table].items())
+    path = path.replace("'", "''")
+    return f"read_csv('{path}', header = true, columns = {{{columns}}})"
+
+
+def _categorical(values, categories):
+    return pd.Categorical(np.asarray(values, dtype=object), categories=categories)
+
+
+def _restore_dtypes(df, dtypes):
+    """Cast the columns of a query result back to the pandas ``dtypes`` they came from."""
+    for col, dtype in dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype):
+            df[col] = _categorical(df[col], dtype.categories)
+        elif df[col].dtype != dtype:
+            df[col] = df[col].astype(dtype)
+    return df
+
+
+class DuckDBBackend:
+    """Lazy, multithreaded DuckDB implementation of the ``PandasBackend`` operations.
+
+    ``threads`` caps the number of DuckDB worker threads (default: all cores).
+    """
+
+    name = 'duckdb'
+
+    def __init__(self, data_root, threads=None):
+        if not HAVE_DUCKDB:
+            raise ImportError("The duckdb backend needs the duckdb package (pip install duckdb)")
+        self.data_root = data_root
+        self.con = duckdb.connect()
+        if threads:
+            self.con.execute(f"SET threads TO {int(threads)}")
+        for table in ['moodle', 'studentMoodleInteract']:
+            self.con.execute(f"CREATE VIEW {table} AS SELECT * FROM {_csv_scan(table_path(table, data_root), table)}")
+
+    def _values(self, query):
+        return [row[0] for row in self.con.execute(query).fetchall()]
+
+    def _join(self, left, right, on, validate, name):
+        """Left join of two DataFrames with ``pd.merge``'s validation, columns and row order."""
+        keys = ', '.join(on)
+        sides = [('right', right)] if validate == 'many_to_one' else [('left', left), ('right', right)]
+        for side, df in sides:
+            self.con.register('_side', df[on])
+            if self._values(f"SELECT COUNT(*) - COUNT(DISTINCT ({keys})) FROM _side")[0]:
+                raise MergeError(f"{name}: merge keys are not unique in {side} dataset; not a {validate} merge")
+        self.con.register('_left', left.assign(_row=np.arange(len(left))))
+        self.con.register('_right', right)
+        match = ' AND '.join(f"l.{col}::VARCHAR = r.{col}::VARCHAR" if left[col].dtype.kind == 'O'
+                             or isinstance(left[col].dtype, pd.CategoricalDtype) else f"l.{col} = r.{col}"
+                             for col in on)
+        extra = [col for col in right.columns if col not in on]
+        selected = ', '.join([f"l.{col}" for col in left.columns] + [f"r.{col}" for col in extra])
+        merged = self.con.execute(
+            f"SELECT {selected} FROM _left l LEFT JOIN _right r ON {match} ORDER BY l._row").df()
+        for view in ['_side', '_left', '_right']:
+            self.con.unregister(view)
+        return _restore_dtypes(merged, {**left.dtypes.to_dict(), **right[extra].dtypes.to_dict()})
+
+    def merge_registration(self, student_info, registration):
+        return self._join(student_info, registration[ENROLMENT_KEY + REGISTRATION_DATES], ENROLMENT_KEY,
+                          'one_to_one', 'studentInfo x registration')
+
+    def _moodle_sites(self):
+        conflicts = self._values(
+            "SELECT id_site FROM moodle GROUP BY id_site HAVING COUNT(DISTINCT activity_type) > 1 LIMIT 1")
+        if conflicts:
+            raise ValueError("moodle has id_site values with conflicting 'activity_type'")
+        return "(SELECT DISTINCT id_site, activity_type FROM moodle)"
+
+    def click_rollups(self):
+        """The Section 1.5 tables, aggregated in DuckDB from the click and moodle csv files.
+
+        The click scan, moodle join and fine-grain aggregation are one query, whose
+        small result is kept as a temporary table for the five rollups.
+        """
+        self.con.execute(f"""
+            CREATE OR REPLACE TEMP TABLE fine AS
+            SELECT c.id_student, c.code_module, c.code_presentation, s.activity_type,
+                   SUM(c.sum_click)::BIGINT AS sum_click, COUNT(*)::BIGINT AS count
+            FROM studentMoodleInteract c LEFT JOIN {self._moodle_sites()} s USING (id_site)
+            GROUP BY ALL""")
+        # Categoricals of the loaded tables have sorted dictionaries of every value in the file.
+        modules = self._values("SELECT DISTINCT code_module FROM fine ORDER BY 1")
+        presentations = self._values("SELECT DISTINCT code_presentation FROM fine ORDER BY 1")
+        activities = self._values("SELECT DISTINCT activity_type FROM moodle ORDER BY 1")
+        dtypes = {
+            'id_student': 'int32',
+            'code_module': pd.CategoricalDtype(modules),
+            'code_presentation': pd.CategoricalDtype(presentations),
+            'activity_type': pd.CategoricalDtype(activities),
+            'year': 'int64',
+            'sum_click': 'int64',
+        }
+
+        def query(sql, columns):
+            return _restore_dtypes(self.con.execute(sql).df(), {col: dtypes[col] for col in columns})
+
+        rollups = {
+            'total_clicks_per_course_semester': query("""
+                SELECT code_module, code_presentation, SUM(sum_click)::BIGINT AS sum_click
+                FROM fine GROUP BY ALL ORDER BY ALL""", ['code_module', 'code_presentation', 'sum_click']),
+            'average_clicks_per_course_year': query("""
+                SELECT code_module, left(code_presentation, 4)::BIGINT AS year,
+                       SUM(sum_click) / SUM(count) AS sum_click
+                FROM fine GROUP BY ALL ORDER BY code_module, year""", ['code_module', 'year']),
+            'clicks_by': query("""
+                SELECT activity_type, code_module, SUM(sum_click)::BIGINT AS sum_click
+                FROM fine WHERE activity_type IS NOT NULL GROUP BY ALL ORDER BY ALL""",
+                               ['activity_type', 'code_module', 'sum_click']),
+            'clicks_by_activity': query(f"""
+                SELECT {', '.join(FINE_KEY)}, sum_click
+                FROM fine WHERE activity_type IS NOT NULL ORDER BY ALL""", FINE_KEY + ['sum_click']),
+        }
+
+        pivot = query(f"""
+            PIVOT (SELECT {', '.join(FINE_KEY)}, sum_click FROM fine WHERE activity_type IS NOT NULL)
+            ON activity_type USING FIRST(sum_click) GROUP BY {', '.join(PIVOT_KEY)}
+            ORDER BY {', '.join(PIVOT_KEY)}""", PIVOT_KEY)
+        # pivot_table averages (float) and only has columns for the activities with clicks.
+        observed = [col for col in activities if col in pivot.columns]
+        pivot = pivot[PIVOT_KEY].join(pivot[observed].astype('float64').fillna(0.0))
+        pivot.columns = pd.Index(pivot.columns, name='activity_type')
+        rollups['pivot_clicks'] = pivot
+        return rollups
+
+    def clicks_with_result(self, clicks_by_activity, student_info):
+        return self._join(clicks_by_activity, student_info[ENROLMENT_KEY + ['final_result']], ENROLMENT_KEY,
+                          'many_to_one', 'clicks_by_activity x studentInfo')
+
+
+BACKENDS = {'pandas': PandasBackend, 'duckdb': DuckDBBackend}
+
+
+def get_backend(name, data_root, **kwargs):
+    """Backend ``name`` ('pandas' or 'duckdb') for the dataset in ``data_root``."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend {name!r}; expected one of {sorted(BACKENDS)}")
+    return BACKENDS[name](data_root, **kwargs)
+
+
+def compare_backends(data_root, other='duckdb', cache_dir=None, use_cache=True):
+    """Run every operation on the pandas backend and on ``other`` and compare the frames.
+
+    Returns the names of the tables that differ (empty when the backends agree).
+    """
+    reference = PandasBackend(data_root, cache_dir, use_cache)
+    candidate = get_backend(other, data_root)
+    student_info = load_table('studentInfo', data_root, cache_dir, use_cache)
+    registration = load_table('studentRegistration', data_root, cache_dir, use_cache)
+
+    results = []
+    for backend in [reference, candidate]:
+        tables = backend.click_rollups()
+        tables['studentInfo x registration'] = backend.merge_registration(student_info, registration)
+        tables['final_merged'] = backend.clicks_with_result(tables['clicks_by_activity'], student_info)
+        results.append(tables)
+    mismatches = []
+    for name, df in results[0].items():
+        try:
+            pd.testing.assert_frame_equal(results[1][name], df)
+        except AssertionError:
+            mismatches.append(name)
+    return mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check that a query backend returns the same frames as pandas.')
+    parser.add_argument('--data-root', required=True, help='folder containing the OULAD csv files')
+    parser.add_argument('--backend', default='duckdb', choices=sorted(set(BACKENDS) - {'pandas'}))
+    args = parser.parse_args(argv)
+    mismatches = compare_backends(args.data_root, args.backend)
+    print(f'{args.backend} and pandas differ: ' + ', '.join(mismatches) if mismatches
+          else f'{args.backend} and pandas return identical frames')
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
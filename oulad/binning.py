@@ -0,0 +1,91 @@
+"""Declarative bins for the integer day columns of studentRegistration.
+
+A ``BinSpec`` names the source column, the inner bin edges (the outermost bins are
+open-ended, so no infinite float edges are needed) and the labels. Bins are closed on
+the left like ``pd.cut(..., right=False)``: the bin of a day is the number of edges at
+or below it, found with one ``np.searchsorted`` over the integer values. Results are
+ordered categoricals with int8 codes; missing days get a missing category.
+
+A spec can also bin relative to ``module_presentation_length``: the day is first
+shifted by the length of the enrolment's presentation, so the edges count days from
+the end of the course instead of its start.
+"""
+
+import numpy as np
+import pandas as pd
+
+from oulad.loader import PRESENTATION_KEY
+
+LENGTH_COLUMN = 'module_presentation_length'
+
+
+class BinSpec:
+    """Bins of ``column`` into ``labels``; ``edges`` are the len(labels) - 1 inner edges."""
+
+    def __init__(self, name, column, edges, labels, relative_to_end=False):
+        if len(labels) != len(edges) + 1:
+            raise ValueError(f"{name}: {len(edges)} inner edges need {len(edges) + 1} labels, got {len(labels)}")
+        if list(edges) != sorted(set(edges)):
+            raise ValueError(f"{name}: bin edges must be strictly increasing")
+        self.name = name
+        self.column = column
+        self.edges = np.asarray(edges, dtype=np.int64)
+        self.labels = list(labels)
+        self.relative_to_end = relative_to_end
+
+    def __repr__(self):
+        return f'BinSpec({self.name!r}, {self.column!r}, edges={self.edges.tolist()}, labels={self.labels})'
+
+    def codes(self, days):
+        """int8 bin codes of an integer (nullable) day column; -1 for missing days."""
+        missing = days.isna().to_numpy()
+        values = days.to_numpy(dtype=np.float64, na_value=0).astype(np.int64)
+        codes = np.searchsorted(self.edges, values, side='right').astype(np.int8)
+        codes[missing] = -1
+        return codes
+
+    def categorical(self, codes):
+        return pd.Categorical.from_codes(codes, categories=self.labels, ordered=True)
+
+
+# Section 1.3 TASK2/TASK3: registration and unregistration timing.
+REGISTRATION_TIMING = BinSpec(
+    'registration_category', 'date_registration', edges=[-120, -60, 0, 60],
+    labels=['Very early birds', 'Early birds', 'In-time', 'Late-comers', 'Very Late-comers'])
+UNREGISTRATION_TIMING = BinSpec(
+    'unregistration_category', 'date_unregistration', edges=[-60, 0, 60, 120],
+    labels=['Very Early unregistration', 'Early unregistration', 'In-time', 'Lately unregistration',
+            'Very Lately unregistration'])
+
+
+def presentation_lengths(df, courses):
+    """``module_presentation_length`` of every row's presentation (NaN if not in ``courses``)."""
+    index = pd.MultiIndex.from_frame(courses[PRESENTATION_KEY].astype(str))
+    position = index.get_indexer(pd.MultiIndex.from_frame(df[PRESENTATION_KEY].astype(str)))
+    lengths = courses[LENGTH_COLUMN].to_numpy(dtype=np.float64)
+    return pd.Series(np.where(position >= 0, lengths[position], np.nan), index=df.index)
+
+
+def bin_columns(df, specs, courses=None):
+    """Bin every spec's column of ``df`` in one call; returns a DataFrame of the categoricals.
+
+    ``courses`` (with ``module_presentation_length``) is needed for specs relative to the
+    end of the presentation; rows of presentations missing from it get missing bins.
+    """
+    lengths = None
+    binned = {}
+    for spec in specs:
+        days = df[spec.column]
+        if spec.relative_to_end:
+            if courses is None:
+                raise ValueError(f"{spec.name} is relative to {LENGTH_COLUMN}; pass courses")
+            if lengths is None:
+                lengths = presentation_lengths(df, courses)
+            days = days.astype('Float64') - lengths
+        binned[spec.name] = spec.categorical(spec.codes(days))
+    return pd.DataFrame(binned, index=df.index)
+
+
+def assign_bins(df, specs, courses=None):
+    """Copy of ``df`` with the binned columns added."""
+    return df.assign(**bin_columns(df, specs, courses))
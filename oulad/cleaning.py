@@ -0,0 +1,30 @@
+"""Section 1.2 cleaning of studentInfo, shared by training and scoring.
+
+``oulad.pipeline`` fits the demographic encoder on cleaned studentInfo, so scoring
+(``oulad.scoring``) has to merge the same minority categories before encoding;
+otherwise the merged-away values are unseen by the encoder and encode as all zeros.
+"""
+
+# Section 1.2 TASK2: merged minority categories.
+EDUCATION_MERGES = {
+    'Post Graduate Qualification': 'A Level or High',
+    'No Formal quals': 'Lower Than A Level',
+    'HE Qualification': 'A Level or High',
+    'A Level or Equivalent': 'A Level or High',
+}
+AGE_MERGES = {'55<=': '35-55'}
+
+
+def merge_minority_categories(student_info, education_merges=EDUCATION_MERGES, age_merges=AGE_MERGES):
+    """Copy of ``student_info`` with the minority education/age categories merged.
+
+    Merged values are not merged again, so already cleaned frames pass through unchanged.
+    """
+    return student_info.assign(highest_education=student_info['highest_education'].replace(education_merges),
+                               age_band=student_info['age_band'].replace(age_merges))
+
+
+def clean_student_info(student_info, education_merges=EDUCATION_MERGES, age_merges=AGE_MERGES):
+    """Drop rows with missing values and merge the minority education/age categories."""
+    student_info = student_info.dropna().reset_index(drop=True)
+    return merge_minority_categories(student_info, education_merges, age_merges)
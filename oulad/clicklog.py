@@ -0,0 +1,332 @@
+"""Memory-mapped columnar storage for the studentMoodleInteract click log.
+
+The click log is by far the largest table. ``build_click_store`` converts the CSV once
+into one raw binary file per column (categorical columns as small integer codes plus a
+sorted dictionary, with -1 for a missing value as in ``pd.Categorical``); ``ClickLog``
+opens them as read-only ``np.memmap`` arrays, so column access is zero-copy and the OS
+pages data in on demand. ``grouped_sum`` reduces the log block by block, so its memory
+use grows with the number of output groups rather than with the number of clicks.
+"""
+
+import itertools
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from oulad.joins import UNKNOWN
+from oulad.loader import CHUNK_SIZE, SCHEMAS, iter_csv_chunks, source_signature, table_path
+
+TABLE = 'studentMoodleInteract'
+STORE_VERSION = 2
+BLOCK_ROWS = 1_000_000
+
+# On-disk dtype of every column; categoricals are stored as their codes. The integer
+# columns are not nullable in SCHEMAS, so a csv with nulls there fails to parse.
+COLUMN_DTYPES = {
+    'code_module': 'int8',
+    'code_presentation': 'int8',
+    'id_student': 'int32',
+    'id_site': 'int32',
+    'date': 'int16',
+    'sum_click': 'int16',
+}
+CATEGORICAL = [col for col, dtype in SCHEMAS[TABLE].items() if dtype == 'category']
+
+
+def _column_path(store_dir, column):
+    return os.path.join(store_dir, column + '.bin')
+
+
+def _meta_path(store_dir):
+    return os.path.join(store_dir, 'meta.json')
+
+
+def _translate(codes, table, dtype):
+    """``table[codes]`` for category codes, keeping the missing code -1."""
+    present = codes >= 0
+    values = np.full(len(codes), -1, dtype=dtype)
+    values[present] = table[codes[present]]
+    return values
+
+
+def build_click_store(csv_path, store_dir, chunksize=CHUNK_SIZE):
+    """Convert the click log CSV into a memory-mappable column store in ``store_dir``.
+
+    The CSV is read in chunks and each chunk is appended to the column files, so the
+    conversion never holds more than one chunk in memory.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    dictionaries = {col: {} for col in CATEGORICAL}
+    files = {col: open(_column_path(store_dir, col), 'wb') for col in COLUMN_DTYPES}
+    n_rows = 0
+    ranges = {}
+    try:
+        for chunk in iter_csv_chunks(csv_path, TABLE, chunksize):
+            for col, dtype in COLUMN_DTYPES.items():
+                if col in dictionaries:
+                    # Translate the chunk's local codes into store-wide codes.
+                    lookup = dictionaries[col]
+                    for value in chunk[col].cat.categories:
+                        lookup.setdefault(value, len(lookup))
+                    local_to_store = np.array([lookup[v] for v in chunk[col].cat.categories], dtype=dtype)
+                    values = _translate(chunk[col].cat.codes.to_numpy(), local_to_store, dtype)
+                else:
+                    values = chunk[col].to_numpy(dtype=dtype)
+                    if len(values):
+                        lo, hi = int(values.min()), int(values.max())
+                        old = ranges.get(col, (lo, hi))
+                        ranges[col] = (min(lo, old[0]), max(hi, old[1]))
+                files[col].write(values.tobytes())
+            n_rows += len(chunk)
+    finally:
+        for f in files.values():
+            f.close()
+
+    # Re-code so every dictionary is sorted, matching the categories of load_table.
+    categories = {}
+    for col, lookup in dictionaries.items():
+        values = sorted(lookup)
+        categories[col] = values
+        recode = np.empty(len(lookup), dtype=COLUMN_DTYPES[col])
+        for new_code, value in enumerate(values):
+            recode[lookup[value]] = new_code
+        if n_rows and not np.array_equal(recode, np.arange(len(recode))):
+            codes = np.memmap(_column_path(store_dir, col), dtype=COLUMN_DTYPES[col], mode='r+', shape=(n_rows,))
+            for start in range(0, n_rows, BLOCK_ROWS):
+                codes[start:start + BLOCK_ROWS] = _translate(codes[start:start + BLOCK_ROWS], recode, recode.dtype)
+            codes.flush()
+            del codes
+
+    meta = {
+        'store_version': STORE_VERSION,
+        'source': source_signature(csv_path),
+        'n_rows': n_rows,
+        'dtypes': COLUMN_DTYPES,
+        'categories': categories,
+        'ranges': ranges,
+    }
+    with open(_meta_path(store_dir), 'w') as f:
+        json.dump(meta, f)
+    return ClickLog(store_dir)
+
+
+def store_is_current(csv_path, store_dir):
+    """True if ``store_dir`` holds a store built from the current version of ``csv_path``."""
+    if not os.path.exists(_meta_path(store_dir)):
+        return False
+    with open(_meta_path(store_dir)) as f:
+        meta = json.load(f)
+    return meta.get('store_version') == STORE_VERSION and meta.get('source') == source_signature(csv_path)
+
+
+def open_click_log(data_root, cache_dir=None, chunksize=CHUNK_SIZE):
+    """Open the click store for ``data_root``, (re)building it if the CSV changed.
+
+    The store lives in ``<cache_dir>/studentMoodleInteract`` (``cache_dir`` defaults to
+    ``<data_root>/.cache``, as for ``load_table``).
+    """
+    csv_path = table_path(TABLE, data_root)
+    store_dir = os.path.join(cache_dir or os.path.join(data_root, '.cache'), TABLE)
+    if not store_is_current(csv_path, store_dir):
+        return build_click_store(csv_path, store_dir, chunksize)
+    return ClickLog(store_dir)
+
+
+class ClickLog:
+    """Read-only, memory-mapped view of a click store."""
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        with open(_meta_path(store_dir)) as f:
+            self.meta = json.load(f)
+        self.n_rows = self.meta['n_rows']
+        self.categories = self.meta['categories']
+        self._columns = {}
+
+    def __len__(self):
+        return self.n_rows
+
+    def column(self, name):
+        """Zero-copy array for column ``name`` (category codes, -1 if missing, for categoricals)."""
+        if name not in self._columns:
+            dtype = self.meta['dtypes'][name]
+            if self.n_rows:
+                self._columns[name] = np.memmap(
+                    _column_path(self.store_dir, name), dtype=dtype, mode='r', shape=(self.n_rows,))
+            else:
+                self._columns[name] = np.empty(0, dtype=dtype)
+        return self._columns[name]
+
+    def value_range(self, name):
+        """(min, max) of a column; codes span the dictionary for categoricals."""
+        if name in self.categories:
+            return 0, max(len(self.categories[name]) - 1, 0)
+        return tuple(self.meta['ranges'].get(name, (0, 0)))
+
+    def iter_blocks(self, columns, block_rows=BLOCK_ROWS):
+        """Yield dicts of column slices (views on the memory map) of ``block_rows`` rows."""
+        for start in range(0, self.n_rows, block_rows):
+            yield {name: self.column(name)[start:start + block_rows] for name in columns}
+
+    def rows_where(self, block_rows=BLOCK_ROWS, **values):
+        """Positions of the rows whose columns equal ``values`` (labels for categoricals).
+
+        E.g. ``rows_where(code_module='AAA', code_presentation='2013J')`` selects one
+        presentation. A label missing from a column's dictionary matches no rows, and
+        neither do missing values.
+        """
+        targets = {}
+        for name, value in values.items():
+            if name in self.categories:
+                if value not in self.categories[name]:
+                    return np.empty(0, dtype=np.int64)
+                value = self.categories[name].index(value)
+            targets[name] = value
+        positions = []
+        for start in range(0, self.n_rows, block_rows):
+            mask = np.ones(min(block_rows, self.n_rows - start), dtype=bool)
+            for name, value in targets.items():
+                mask &= self.column(name)[start:start + block_rows] == value
+            positions.append(np.flatnonzero(mask) + start)
+        return np.concatenate(positions) if positions else np.empty(0, dtype=np.int64)
+
+    def group_rows(self, by, block_rows=BLOCK_ROWS):
+        """Positions of the rows of every combination of the categorical ``by`` columns.
+
+        Returns a dict keyed by label tuples, e.g. ``{('AAA', '2013J'): positions}`` for
+        ``by=['code_module', 'code_presentation']``, with each group's positions in
+        ascending order. Unlike one ``rows_where`` per group, the log is read once; rows
+        with a missing value in ``by`` are left out.
+        """
+        # Missing codes are packed after the last category and dropped at the end.
+        ranges = {name: (0, len(self.categories[name])) for name in by}
+        n_keys = int(np.prod([len(self.categories[name]) + 1 for name in by]))
+        keys = np.empty(self.n_rows, dtype=np.min_scalar_type(n_keys))
+        for start in range(0, self.n_rows, block_rows):
+            block = {}
+            for name in by:
+                codes = self.column(name)[start:start + block_rows].astype(np.int64)
+                codes[codes < 0] = len(self.categories[name])
+                block[name] = codes
+            keys[start:start + block_rows] = _pack_keys(block, by, ranges)
+        # A stable sort keeps every group's rows in order (a radix sort for small key types).
+        order = np.argsort(keys, kind='stable')
+        bounds = np.concatenate([[0], np.cumsum(np.bincount(keys, minlength=n_keys))])
+        # Keys enumerate the label combinations in mixed-radix order, None standing for missing.
+        labels = itertools.product(*[self.categories[name] + [None] for name in by])
+        groups = {}
+        for key, label in enumerate(labels):
+            if None not in label and bounds[key + 1] > bounds[key]:
+                groups[label] = order[bounds[key]:bounds[key + 1]]
+        return groups
+
+    def to_frame(self, columns=None, rows=None):
+        """Materialize the log as a DataFrame with the same dtypes as ``load_table``.
+
+        ``rows`` optionally restricts it to the given row positions (see ``rows_where``).
+        """
+        columns = columns or list(COLUMN_DTYPES)
+        data = {}
+        for name in columns:
+            values = np.asarray(self.column(name))
+            if rows is not None:
+                values = values[rows]
+            if name in self.categories:
+                data[name] = pd.Categorical.from_codes(values, categories=self.categories[name])
+            else:
+                data[name] = values.copy()
+        return pd.DataFrame(data)
+
+
+def _pack_keys(block, by, ranges):
+    """Combine several integer key columns into one int64 key per row."""
+    key = np.zeros(len(block[by[0]]), dtype=np.int64)
+    for name in by:
+        lo, hi = ranges[name]
+        key *= hi - lo + 1
+        key += block[name].astype(np.int64) - lo
+    return key
+
+
+def _unpack_keys(key, by, ranges):
+    columns = {}
+    for name in reversed(by):
+        lo, hi = ranges[name]
+        span = hi - lo + 1
+        columns[name] = key % span + lo
+        key = key // span
+    return {name: columns[name] for name in by}
+
+
+def _reduce(keys, sums, counts):
+    unique, inverse = np.unique(keys, return_inverse=True)
+    return (unique,
+            np.bincount(inverse, weights=sums, minlength=len(unique)),
+            np.bincount(inverse, weights=counts, minlength=len(unique)))
+
+
+def grouped_sum(log, by, value='sum_click', lookups=(), dropna=True, block_rows=BLOCK_ROWS):
+    """Sum and count of ``value`` per group of the ``by`` columns.
+
+    ``by`` may also name the column of a ``joins.SiteLookup`` passed in ``lookups``
+    (e.g. ``activity_type``); it is derived per block from ``id_site``. Groups with a
+    missing category or an unknown lookup value are dropped, as ``groupby`` drops NaN
+    keys, unless ``dropna`` is False, in which case they are kept with a NaN key.
+
+    Returns a DataFrame with the ``by`` columns (categoricals restored from their
+    codes), ``value`` (the sum) and ``count``, sorted like a pandas groupby. Each block
+    is reduced to its distinct keys before being combined, so only one block of keys
+    and the running partial groups are ever in memory.
+    """
+    by = list(by)
+    lookups = {lookup.column: lookup for lookup in lookups}
+    stored = [name for name in by if name not in lookups]
+    if lookups:
+        stored = list(dict.fromkeys(stored + ['id_site']))
+    ranges = {name: log.value_range(name) for name in by if name not in lookups}
+    # Missing categories (code -1) and unknown lookup values are packed after the last
+    # category, so that they sort last like the NaN keys of a pandas groupby.
+    missing = {name: len(log.categories[name]) for name in by if name in log.categories}
+    missing.update({name: len(lookup.categories) for name, lookup in lookups.items()})
+    for name, code in missing.items():
+        ranges[name] = (0, code)
+
+    partial_keys = np.empty(0, dtype=np.int64)
+    partial_sums = np.empty(0)
+    partial_counts = np.empty(0)
+    for block in log.iter_blocks(stored + [value], block_rows):
+        for name, lookup in lookups.items():
+            block[name] = lookup.codes(block['id_site'])
+        for name, code in missing.items():
+            codes = block[name].astype(np.int64)
+            codes[codes == UNKNOWN] = code
+            block[name] = codes
+        keys, sums, counts = _reduce(
+            _pack_keys(block, by, ranges), block[value].astype(np.float64), np.ones(len(block[value])))
+        partial_keys, partial_sums, partial_counts = _reduce(
+            np.concatenate([partial_keys, keys]),
+            np.concatenate([partial_sums, sums]),
+            np.concatenate([partial_counts, counts]))
+
+    columns = _unpack_keys(partial_keys, by, ranges)
+    for name, code in missing.items():
+        columns[name][columns[name] == code] = UNKNOWN
+    keep = np.ones(len(partial_keys), dtype=bool)
+    if dropna:
+        for name in missing:
+            keep &= columns[name] != UNKNOWN
+
+    result = {}
+    for name, values in columns.items():
+        values = values[keep]
+        if name in lookups:
+            result[name] = pd.Categorical.from_codes(values, categories=lookups[name].categories)
+        elif name in log.categories:
+            result[name] = pd.Categorical.from_codes(values, categories=log.categories[name])
+        else:
+            result[name] = values.astype(log.meta['dtypes'][name])
+    result[value] = partial_sums[keep].astype(np.int64)
+    result['count'] = partial_counts[keep].astype(np.int64)
+    return pd.DataFrame(result)
@@ -0,0 +1,90 @@
+"""Run configuration: where the OULAD csv files live and where outputs are written.
+
+On Colab the data sits on a mounted Google Drive; everywhere else the paths come from
+the command line or from the ``OULAD_DATA_ROOT`` / ``OULAD_OUTPUT_DIR`` /
+``OULAD_CACHE_DIR`` environment variables, so the pipeline can run headless.
+"""
+
+import argparse
+import os
+
+from oulad.loader import CHUNK_SIZE
+
+COLAB_DRIVE = '/content/drive'
+COLAB_DATA_ROOT = '/content/drive/MyDrive/dataset'
+
+DEFAULT_DATA_ROOT = 'dataset'
+DEFAULT_OUTPUT_DIR = 'output'
+STAGE_CACHE_MIB = 2048
+
+
+def running_in_colab():
+    """True when executed inside a Google Colab runtime."""
+    try:
+        import google.colab  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def mount_drive(mountpoint=COLAB_DRIVE):
+    """Mount Google Drive on Colab (no-op if it is already mounted)."""
+    from google.colab import drive
+    if not os.path.ismount(mountpoint):
+        drive.mount(mountpoint)
+
+
+def _env_int(name):
+    value = os.environ.get(name)
+    return int(value) if value else None
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='CEIT 418 OULAD data science pipeline.')
+    parser.add_argument('--data-root', default=os.environ.get('OULAD_DATA_ROOT'),
+                        help='folder containing the OULAD csv files')
+    parser.add_argument('--output-dir', default=os.environ.get('OULAD_OUTPUT_DIR', DEFAULT_OUTPUT_DIR),
+                        help='folder the result tables are written to')
+    parser.add_argument('--cache-dir', default=os.environ.get('OULAD_CACHE_DIR'),
+                        help='folder for the parsed-table cache (default: <data-root>/.cache)')
+    parser.add_argument('--no-cache', action='store_true', help='always parse the csv files and rerun every stage')
+    parser.add_argument('--stage-cache-mib', type=int, default=_env_int('OULAD_STAGE_CACHE_MIB') or STAGE_CACHE_MIB,
+                        help='size limit of the stage output cache (<cache-dir>/stages); least recently used '
+                             'outputs are evicted beyond it')
+    parser.add_argument('--model-dir', default=os.environ.get('OULAD_MODEL_DIR'),
+                        help='fit the Section 2.3 model on all enrolments and save it here for scoring')
+    parser.add_argument('--stream', action='store_true',
+                        help='aggregate the click csv in chunks without building the click store (bounded memory)')
+    parser.add_argument('--chunksize', type=int, default=_env_int('OULAD_CHUNKSIZE') or CHUNK_SIZE,
+                        help='click rows per chunk in --stream mode')
+    parser.add_argument('--backend', default=os.environ.get('OULAD_BACKEND', 'pandas'), choices=['pandas', 'duckdb'],
+                        help='engine of the click rollups and joins (duckdb: lazy multithreaded queries on the csv)')
+    parser.add_argument('--jobs', type=int, default=_env_int('OULAD_JOBS'),
+                        help='run the per-presentation steps on this many worker processes (-1: all cores)')
+    parser.add_argument('--figures', action='store_true',
+                        help='also render the report figures (PNG and SVG) to <output-dir>/figures')
+    parser.add_argument('--profile-stage',
+                        help='also capture cProfile and tracemalloc dumps of this pipeline stage')
+    parser.add_argument('--check-sharding', action='store_true',
+                        help='compare the sharded and unsharded outputs instead of writing them')
+    return parser
+
+
+def get_config(argv=None, strict=False):
+    """Parse the run configuration.
+
+    Unknown arguments are ignored unless ``strict`` is set, so this also works inside
+    Jupyter/Colab kernels, which pass their own flags. Without an explicit data root
+    the Colab Drive folder is used (mounting Drive first) when running on Colab, and
+    ``./dataset`` otherwise.
+    """
+    parser = build_parser()
+    if strict:
+        config = parser.parse_args(argv)
+    else:
+        config, _ = parser.parse_known_args(argv)
+    if config.data_root is None:
+        config.data_root = COLAB_DATA_ROOT if running_in_colab() else DEFAULT_DATA_ROOT
+    if config.data_root.startswith(COLAB_DRIVE) and running_in_colab():
+        mount_drive()
+    return config
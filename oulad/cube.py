@@ -0,0 +1,65 @@
+"""Enrolment, registration and unregistration counts per demographic cell.
+
+Section 1.3 TASK4 asks how registration behaviour differs across demographic groups.
+Instead of grouping the joined studentInfo x registration table again for every
+variable, ``RateCube`` counts it once per combination of all demographic variables and
+the final result. Any marginal count or rate is then a sum over the cube, whose size is
+the number of occupied cells rather than the number of enrolments.
+"""
+
+import pandas as pd
+
+from oulad.joins import merge_checked
+from oulad.loader import ENROLMENT_KEY
+
+CUBE_DIMENSIONS = ['highest_education', 'region', 'disability', 'imd_band', 'age_band', 'gender', 'final_result']
+MEASURES = ['enrolments', 'registrations', 'unregistrations']
+
+
+class RateCube:
+    """Counts per (highest_education, region, disability, imd_band, age_band, gender, final_result)."""
+
+    def __init__(self, counts):
+        self.counts = counts
+
+    @classmethod
+    def from_frame(cls, merged, dimensions=CUBE_DIMENSIONS):
+        """Build the cube from studentInfo already joined with studentRegistration.
+
+        Missing dimension values are kept as their own cell, so the marginals add up to
+        the number of enrolments.
+        """
+        grouped = merged.groupby(list(dimensions), observed=True, dropna=False)
+        counts = pd.DataFrame({
+            'enrolments': grouped.size(),
+            'registrations': grouped['date_registration'].count(),
+            'unregistrations': grouped['date_unregistration'].count(),
+        })
+        return cls(counts)
+
+    @classmethod
+    def from_tables(cls, student_info, registration, dimensions=CUBE_DIMENSIONS):
+        merged = merge_checked(student_info, registration[ENROLMENT_KEY + ['date_registration', 'date_unregistration']],
+                               on=ENROLMENT_KEY, how='left', validate='one_to_one', name='studentInfo x registration')
+        return cls.from_frame(merged, dimensions)
+
+    @property
+    def dimensions(self):
+        return list(self.counts.index.names)
+
+    def marginal(self, by):
+        """Counts summed over every dimension not in ``by`` (a name or a list of names)."""
+        by = [by] if isinstance(by, str) else list(by)
+        return self.counts.groupby(level=by, observed=True, dropna=False).sum()
+
+    def rates(self, by):
+        """Registration and unregistration rates (count / enrolments) per ``by`` group."""
+        counts = self.marginal(by)
+        return pd.DataFrame({
+            'registration_rate': counts['registrations'] / counts['enrolments'],
+            'unregistration_rate': counts['unregistrations'] / counts['enrolments'],
+        })
+
+    def to_frame(self):
+        """The cube as a flat table (one row per occupied cell)."""
+        return self.counts.reset_index()
@@ -0,0 +1,87 @@
+"""Fitted one-hot encoder for the demographic columns of studentInfo.
+
+``pd.get_dummies`` derives its columns from whatever rows it is given, so folds, new
+presentations and scoring batches can end up with different column sets. The encoder
+stores the category vocabularies once at fit time and always emits the same columns
+in the same order; it can be saved to JSON and loaded again for scoring.
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+DEMOGRAPHIC_COLUMNS = ['highest_education', 'gender', 'region', 'disability', 'imd_band', 'age_band']
+
+
+class CategoricalEncoder:
+    """One-hot encoder with fixed vocabularies and a stable column order.
+
+    Values not seen during ``fit`` (and missing values) encode as all zeros.
+    """
+
+    def __init__(self, columns=DEMOGRAPHIC_COLUMNS, prefix_sep='_'):
+        self.columns = list(columns)
+        self.prefix_sep = prefix_sep
+        self.categories_ = None
+
+    def fit(self, df):
+        """Learn the sorted vocabulary of every column."""
+        self.categories_ = {col: sorted(df[col].dropna().astype(str).unique()) for col in self.columns}
+        return self
+
+    def _check_fitted(self):
+        if self.categories_ is None:
+            raise ValueError("CategoricalEncoder is not fitted yet; call fit() first")
+
+    @property
+    def feature_names(self):
+        """Output column names, ``<column><prefix_sep><category>`` as in ``pd.get_dummies``."""
+        self._check_fitted()
+        return [f'{col}{self.prefix_sep}{value}' for col in self.columns for value in self.categories_[col]]
+
+    def transform(self, df):
+        """Encode ``df`` as a CSR matrix of uint8 with one column per ``feature_names``."""
+        self._check_fitted()
+        n_rows = len(df)
+        rows, cols = [], []
+        offset = 0
+        for col in self.columns:
+            vocabulary = self.categories_[col]
+            codes = pd.Categorical(df[col].astype(str).where(df[col].notna()), categories=vocabulary).codes
+            known = codes >= 0
+            rows.append(np.flatnonzero(known))
+            cols.append(codes[known].astype(np.int64) + offset)
+            offset += len(vocabulary)
+        rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+        cols = np.concatenate(cols) if cols else np.empty(0, dtype=np.int64)
+        data = np.ones(len(rows), dtype=np.uint8)
+        return sparse.csr_matrix((data, (rows, cols)), shape=(n_rows, offset))
+
+    def transform_frame(self, df):
+        """Encode ``df`` as a dense uint8 DataFrame (same index as ``df``)."""
+        return pd.DataFrame(self.transform(df).toarray(), index=df.index, columns=self.feature_names)
+
+    def fit_transform(self, df):
+        return self.fit(df).transform(df)
+
+    def to_dict(self):
+        self._check_fitted()
+        return {'columns': self.columns, 'prefix_sep': self.prefix_sep, 'categories': self.categories_}
+
+    @classmethod
+    def from_dict(cls, state):
+        encoder = cls(state['columns'], state['prefix_sep'])
+        encoder.categories_ = {col: list(values) for col, values in state['categories'].items()}
+        return encoder
+
+    def save(self, path):
+        """Write the fitted vocabularies to a JSON file."""
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
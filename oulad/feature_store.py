@@ -0,0 +1,183 @@
+"""Persistent, incrementally updated store of the click features.
+
+The click log only grows: each day adds rows with new ``date`` values. Instead of
+re-aggregating the whole history, the store keeps the fine-grain running totals
+(sum and count of ``sum_click`` per student, module, presentation and activity type)
+and folds each new batch of clicks into them, touching only the rows the batch
+affects. ``fine()`` returns the totals in the layout of ``aggregate.fine_grain``, so
+``click_rollups`` and the engagement features derived from it are exactly those of a
+full recompute.
+
+Command line:
+``python -m oulad.feature_store --store clicks.npz --data-root DIR --clicks new_day.csv [--output-dir DIR]``
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from oulad.aggregate import FINE_KEY, click_rollups, fine_grain
+from oulad.joins import UNKNOWN, SiteLookup
+from oulad.loader import iter_csv_chunks, load_table
+
+STORE_VERSION = 1
+STATE_KEY = ['id_student', 'code_module', 'code_presentation', 'activity']
+
+
+class ClickFeatureStore:
+    """Running fine-grain click totals keyed by enrolment and activity type."""
+
+    def __init__(self, activities=()):
+        self.activities = list(activities)
+        # Highest ingested date per "module/presentation"; new clicks must come after it.
+        self.watermarks = {}
+        self._index = pd.MultiIndex.from_arrays(
+            [np.empty(0, np.int32), np.empty(0, object), np.empty(0, object), np.empty(0, np.int16)],
+            names=STATE_KEY)
+        self._sums = np.empty(0, dtype=np.int64)
+        self._counts = np.empty(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self._sums)
+
+    def _activity_codes(self, activity_type):
+        """Store codes of a categorical activity column, extending the vocabulary if needed."""
+        for name in activity_type.cat.categories:
+            if name not in self.activities:
+                self.activities.append(name)
+        position = {name: i for i, name in enumerate(self.activities)}
+        # The trailing entry is what missing (-1) category codes index.
+        recode = np.array([position[name] for name in activity_type.cat.categories] + [UNKNOWN], dtype=np.int16)
+        return recode[activity_type.cat.codes.to_numpy()]
+
+    def _check_dates(self, clicks):
+        """Reject clicks at or before a presentation's watermark; return the new watermarks."""
+        latest = clicks.groupby(['code_module', 'code_presentation'], observed=True)['date'].agg(['min', 'max'])
+        updated = {}
+        for (module, presentation), row in latest.iterrows():
+            name = f'{module}/{presentation}'
+            mark = self.watermarks.get(name)
+            if mark is not None and row['min'] <= mark:
+                raise ValueError(f"Clicks for {name} from day {row['min']} were already ingested "
+                                 f"(store holds days up to {mark})")
+            updated[name] = int(row['max'])
+        return updated
+
+    def ingest(self, clicks, lookup):
+        """Fold a batch of new click rows into the running totals.
+
+        Only the (enrolment, activity) rows present in the batch are updated; new ones
+        are appended. Returns the number of rows updated and added.
+        """
+        updated_marks = self._check_dates(clicks)
+        delta = fine_grain(clicks, lookup)
+        index = pd.MultiIndex.from_arrays([
+            delta['id_student'].to_numpy(dtype=np.int32),
+            delta['code_module'].astype(str).to_numpy(dtype=object),
+            delta['code_presentation'].astype(str).to_numpy(dtype=object),
+            self._activity_codes(delta['activity_type']),
+        ], names=STATE_KEY)
+        sums = delta['sum_click'].to_numpy(dtype=np.int64)
+        counts = delta['count'].to_numpy(dtype=np.int64)
+
+        position = self._index.get_indexer(index)
+        existing = position >= 0
+        self._sums[position[existing]] += sums[existing]
+        self._counts[position[existing]] += counts[existing]
+        if (~existing).any():
+            self._index = self._index.append(index[~existing])
+            self._sums = np.concatenate([self._sums, sums[~existing]])
+            self._counts = np.concatenate([self._counts, counts[~existing]])
+        self.watermarks.update(updated_marks)
+        return {'updated': int(existing.sum()), 'added': int((~existing).sum())}
+
+    def fine(self):
+        """The totals in the layout of ``aggregate.fine_grain`` (same columns, dtypes and order)."""
+        keys = self._index.to_frame(index=False)
+        fine = pd.DataFrame({
+            'id_student': keys['id_student'].to_numpy(dtype=np.int32),
+            'code_module': pd.Categorical(keys['code_module'].astype(str)),
+            'code_presentation': pd.Categorical(keys['code_presentation'].astype(str)),
+            'activity_type': pd.Categorical.from_codes(
+                self._activity_codes_sorted(keys['activity'].to_numpy()), categories=sorted(self.activities)),
+            'sum_click': self._sums,
+            'count': self._counts,
+        })
+        fine = fine.sort_values(FINE_KEY, na_position='last', ignore_index=True)
+        fine['mean'] = fine['sum_click'] / fine['count']
+        return fine
+
+    def _activity_codes_sorted(self, codes):
+        """Map store codes onto the codes of the sorted activity vocabulary."""
+        order = {name: i for i, name in enumerate(sorted(self.activities))}
+        recode = np.array([order[name] for name in self.activities] + [UNKNOWN], dtype=np.int16)
+        return recode[codes]
+
+    def rollups(self):
+        """The Section 1.5 click tables, as ``aggregate.click_rollups`` on a full recompute."""
+        return click_rollups(self.fine())
+
+    def save(self, path):
+        """Write the key columns, totals and metadata to one ``.npz`` file."""
+        keys = self._index.to_frame(index=False)
+        meta = {'store_version': STORE_VERSION, 'activities': self.activities, 'watermarks': self.watermarks}
+        np.savez(path,
+                 id_student=keys['id_student'].to_numpy(dtype=np.int32),
+                 code_module=keys['code_module'].to_numpy(dtype=str),
+                 code_presentation=keys['code_presentation'].to_numpy(dtype=str),
+                 activity=keys['activity'].to_numpy(dtype=np.int16),
+                 sum_click=self._sums,
+                 count=self._counts,
+                 meta=np.asarray(json.dumps(meta)))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            if meta.get('store_version') != STORE_VERSION:
+                raise ValueError(f"{path} was written by an incompatible store version")
+            store = cls(meta['activities'])
+            store.watermarks = meta['watermarks']
+            store._index = pd.MultiIndex.from_arrays([
+                data['id_student'],
+                data['code_module'].astype(object),
+                data['code_presentation'].astype(object),
+                data['activity'],
+            ], names=STATE_KEY)
+            store._sums = data['sum_click'].astype(np.int64)
+            store._counts = data['count'].astype(np.int64)
+        return store
+
+    @classmethod
+    def open(cls, path):
+        """Load the store at ``path``, or start an empty one if it does not exist yet."""
+        return cls.load(path) if os.path.exists(path) else cls()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Add new click rows to the click feature store.')
+    parser.add_argument('--store', required=True, help='.npz file of the store (created if missing)')
+    parser.add_argument('--data-root', required=True, help='folder with moodle.csv')
+    parser.add_argument('--clicks', nargs='+', required=True, help='studentMoodleInteract csv file(s) with new days')
+    parser.add_argument('--output-dir', help='also write the updated click tables here')
+    args = parser.parse_args(argv)
+
+    store = ClickFeatureStore.open(args.store)
+    lookup = SiteLookup(load_table('moodle', args.data_root))
+    for path in args.clicks:
+        clicks = pd.concat(iter_csv_chunks(path, 'studentMoodleInteract'), ignore_index=True)
+        print(path, store.ingest(clicks, lookup))
+    store.save(args.store)
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+        for name, df in store.rollups().items():
+            df.to_csv(os.path.join(args.output_dir, f'{name}.csv'), index=False)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
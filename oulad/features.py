@@ -0,0 +1,67 @@
+"""Student enrolment x activity click matrix and the Section 2.2 engagement features.
+
+Most enrolments click on only a handful of the ~20 activity types, so the click table
+is kept as a ``scipy.sparse`` CSR matrix built directly from integer codes: one row per
+(id_student, code_module, code_presentation) enrolment and one column per activity
+type. The engagement features are then per-row nnz counts and row sums, and the matrix
+can be passed to a model as a design matrix without densifying it.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from oulad.aggregate import PIVOT_KEY
+
+
+def build_click_matrix(clicks_by_activity, value='sum_click'):
+    """Build the enrolment x activity CSR matrix from ``clicks_by_activity``.
+
+    Returns ``(matrix, enrolments, activities)``: ``enrolments`` is a DataFrame of the
+    enrolment key columns giving the row order (sorted like ``pivot_table``) and
+    ``activities`` the column labels (the activity types that occur).
+    """
+    clicks = clicks_by_activity[clicks_by_activity['activity_type'].notna()]
+    grouped = clicks.groupby(PIVOT_KEY, observed=True, sort=True)
+    rows = grouped.ngroup().to_numpy()
+    enrolments = grouped.size().index.to_frame(index=False)
+
+    activity = clicks['activity_type']
+    if not isinstance(activity.dtype, pd.CategoricalDtype):
+        activity = activity.astype('category')
+    activity = activity.cat.remove_unused_categories()
+    activities = activity.cat.categories
+    cols = activity.cat.codes.to_numpy()
+
+    matrix = sparse.csr_matrix(
+        (clicks[value].to_numpy(dtype=np.float64), (rows, cols)),
+        shape=(len(enrolments), len(activities)))
+    matrix.sum_duplicates()
+    matrix.eliminate_zeros()
+    return matrix, enrolments, activities
+
+
+def engagement_features(matrix, enrolments):
+    """Section 2.2 engagement features from the click matrix.
+
+    * ``n_components``: number of activity types the enrolment clicked on,
+    * ``at_least_three_components``: clicked at least three types,
+    * ``average_clicks``: mean clicks over all activity types (zeros included),
+    * ``clicked_all_components``: clicked every activity type.
+    """
+    n_components = np.diff(matrix.indptr)
+    total_clicks = np.asarray(matrix.sum(axis=1)).ravel()
+    features = enrolments.copy()
+    features['n_components'] = n_components
+    features['at_least_three_components'] = n_components >= 3
+    features['average_clicks'] = total_clicks / matrix.shape[1]
+    features['clicked_all_components'] = n_components == matrix.shape[1]
+    return features
+
+
+def click_matrix_frame(matrix, enrolments, activities):
+    """Dense ``pivot_clicks``-style DataFrame of the click matrix (for display)."""
+    dense = pd.DataFrame(matrix.toarray(), columns=activities)
+    frame = pd.concat([enrolments, dense], axis=1)
+    frame.columns.name = 'activity_type'
+    return frame
@@ -0,0 +1,139 @@
+"""Headless rendering of the notebook's figures from pre-aggregated tables.
+
+``figure_tables`` reduces the cleaned studentInfo, the per-course click totals and
+``final_merged`` to the small count/mean tables the seven figures actually plot; the
+activity-by-result means carry a t-based 95% confidence interval, so the bars do not
+need seaborn's bootstrap over every click row. ``render_figures`` draws each figure on
+its own Agg canvas (no pyplot, no interactive backend) in parallel worker processes and
+writes it to ``output_dir`` in every requested format.
+"""
+
+import os
+
+import numpy as np
+import seaborn as sns
+from joblib import Parallel, delayed
+from matplotlib.figure import Figure
+from scipy import stats
+
+FORMATS = ('png', 'svg')
+CONFIDENCE = 0.95
+
+
+def _counts(df, x, hue):
+    # sort=False keeps first-appearance order, which is the order countplot would use.
+    return df.groupby([x, hue], observed=True, sort=False).size().rename('count').reset_index()
+
+
+def mean_ci(df, x, hue, value, confidence=CONFIDENCE):
+    """Mean of ``value`` per (x, hue) with a t-distribution confidence interval."""
+    grouped = df.groupby([x, hue], observed=True, sort=False)[value].agg(['mean', 'std', 'count']).reset_index()
+    half_width = (stats.t.ppf((1 + confidence) / 2, grouped['count'] - 1)
+                  * grouped['std'] / np.sqrt(grouped['count']))
+    grouped['ci_low'] = grouped['mean'] - half_width
+    grouped['ci_high'] = grouped['mean'] + half_width
+    return grouped.rename(columns={'mean': value})
+
+
+def figure_tables(student_info, total_clicks_per_course_semester, final_merged):
+    """The pre-aggregated table behind each figure, keyed by figure name."""
+    return {
+        'education_result': _counts(student_info, 'highest_education', 'final_result'),
+        'region': student_info['region'].value_counts(),
+        'imd_result': _counts(student_info, 'imd_band', 'final_result'),
+        'result_gender': _counts(student_info, 'final_result', 'gender'),
+        'education_gender': _counts(student_info, 'highest_education', 'gender'),
+        'course_clicks': total_clicks_per_course_semester,
+        'activity_result': mean_ci(final_merged, 'activity_type', 'final_result', 'sum_click'),
+    }
+
+
+def _count_bars(ax, table, x, hue, title, xlabel, legend_title=None):
+    sns.barplot(x=x, y='count', hue=hue, data=table, palette='muted', ax=ax)
+    ax.set_title(title)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel('Count')
+    if legend_title:
+        ax.legend(title=legend_title, loc='upper right')
+
+
+def draw_activity_result(ax, table):
+    """Mean clicks per activity type and final result.
+
+    ``table`` is either ``final_merged`` itself (seaborn bootstraps the error bars) or
+    the output of ``mean_ci``, whose ``ci_low``/``ci_high`` are drawn directly.
+    """
+    if 'ci_low' not in table:
+        sns.barplot(x='activity_type', y='sum_click', hue='final_result', data=table, ax=ax)
+    else:
+        sns.barplot(x='activity_type', y='sum_click', hue='final_result', data=table, errorbar=None, ax=ax)
+        hue_levels = [text.get_text() for text in ax.get_legend().get_texts()]
+        x_levels = [label.get_text() for label in ax.get_xticklabels()]
+        ci = table.astype({'activity_type': str, 'final_result': str}).set_index(['activity_type', 'final_result'])
+        for level, bars in zip(hue_levels, ax.containers):
+            for bar in bars:
+                # Categories sit at integer positions; hue bars are dodged around them.
+                center = bar.get_x() + bar.get_width() / 2
+                key = (x_levels[int(round(center))], level)
+                if key in ci.index:
+                    low, high = ci.loc[key, ['ci_low', 'ci_high']]
+                    ax.plot([center, center], [low, high], color='0.26', linewidth=1.5)
+    ax.set_title('Average Clicks on Different Resources by Final Result')
+    ax.set_xlabel('Activity Type')
+    ax.set_ylabel('Average Clicks')
+    ax.tick_params(axis='x', labelrotation=45)
+    for label in ax.get_xticklabels():
+        label.set_horizontalalignment('right')
+    ax.legend(title='Final Result')
+
+
+def _draw_region(ax, counts):
+    ax.pie(counts, labels=counts.index, autopct='%1.1f%%', startangle=140, colors=sns.color_palette('pastel'))
+    ax.set_title('Distribution of Final Result by Region')
+
+
+def _draw_course_clicks(ax, table):
+    sns.barplot(x='code_module', y='sum_click', hue='code_presentation', data=table, ax=ax)
+    ax.set_title('Total Clicks per Course per Semester Delivered')
+    ax.set_xlabel('Course Code')
+    ax.set_ylabel('Total Clicks')
+
+
+# Figure name -> (figure size, drawing function taking (ax, table)).
+FIGURES = {
+    'education_result': ((12, 6), lambda ax, t: _count_bars(
+        ax, t, 'highest_education', 'final_result', 'Final Result vs. Highest Education', 'Highest Education',
+        'Final Result')),
+    'region': ((10, 8), _draw_region),
+    'imd_result': ((12, 6), lambda ax, t: _count_bars(
+        ax, t, 'imd_band', 'final_result', 'Final Result vs. IMD Band', 'IMD Band', 'Final Result')),
+    'result_gender': ((12, 6), lambda ax, t: _count_bars(
+        ax, t, 'final_result', 'gender', 'Final Result Comparison between Males and Females', 'Final Result')),
+    'education_gender': ((12, 6), lambda ax, t: _count_bars(
+        ax, t, 'highest_education', 'gender', 'Highest Education Comparison between Males and Females',
+        'Highest Education', 'Gender')),
+    'course_clicks': ((10, 6), _draw_course_clicks),
+    'activity_result': ((12, 6), draw_activity_result),
+}
+
+
+def render_figure(name, table, output_dir, formats=FORMATS):
+    """Draw figure ``name`` from its table on an Agg canvas and save it; returns the paths."""
+    figsize, draw = FIGURES[name]
+    with sns.axes_style('whitegrid'):
+        figure = Figure(figsize=figsize)
+        draw(figure.subplots(), table)
+    figure.tight_layout()
+    paths = []
+    for fmt in formats:
+        paths.append(os.path.join(output_dir, f'{name}.{fmt}'))
+        figure.savefig(paths[-1], format=fmt)
+    return paths
+
+
+def render_figures(tables, output_dir, formats=FORMATS, n_jobs=-1):
+    """Render every figure of ``tables`` (see ``figure_tables``) in parallel; returns the paths."""
+    os.makedirs(output_dir, exist_ok=True)
+    rendered = Parallel(n_jobs=n_jobs)(
+        delayed(render_figure)(name, table, output_dir, formats) for name, table in tables.items())
+    return [path for paths in rendered for path in paths]
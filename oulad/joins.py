@@ -0,0 +1,133 @@
+"""Join helpers for the OULAD tables."""
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+from oulad.loader import ENROLMENT_KEY
+
+logger = logging.getLogger(__name__)
+
+UNKNOWN = -1
+
+WITHDRAWN = 'Withdrawn'
+
+
+class SiteLookup:
+    """Dictionary-encoded ``id_site -> <moodle column>`` lookup.
+
+    ``id_site`` is a dense integer key into the ~6k-row moodle table, so the lookup is
+    a flat array of category codes indexed by ``id_site``. Attaching the column to the
+    click log is then one vectorized ``take`` instead of a hash join that copies every
+    click column. Sites missing from moodle get the ``UNKNOWN`` code, which becomes
+    NaN in the categorical, exactly like a left ``pd.merge``.
+    """
+
+    def __init__(self, moodle, column='activity_type'):
+        values = moodle[column]
+        if not isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.astype('category')
+        id_site = moodle['id_site'].to_numpy()
+        codes = values.cat.codes.to_numpy()
+
+        # A left merge would duplicate clicks on a repeated id_site; refuse instead.
+        order = np.argsort(id_site, kind='stable')
+        repeated = id_site[order][1:] == id_site[order][:-1]
+        if repeated.any() and (codes[order][1:][repeated] != codes[order][:-1][repeated]).any():
+            raise ValueError(f"moodle has id_site values with conflicting {column!r}")
+
+        self.column = column
+        self.categories = values.cat.categories
+        code_dtype = np.int8 if len(self.categories) < 127 else np.int16
+        size = int(id_site.max()) + 1 if len(id_site) else 0
+        self.table = np.full(size, UNKNOWN, dtype=code_dtype)
+        self.table[id_site] = codes
+
+    @classmethod
+    def from_table(cls, table, categories, column='activity_type'):
+        """Rebuild a lookup from its code table (e.g. one saved with ``save``)."""
+        lookup = cls.__new__(cls)
+        lookup.column = column
+        lookup.categories = pd.Index(categories)
+        lookup.table = np.asarray(table)
+        return lookup
+
+    def save(self, path):
+        """Store the code table and categories in a ``.npz`` file."""
+        np.savez(path, table=self.table, categories=np.asarray(self.categories, dtype=str),
+                 column=np.asarray(self.column))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls.from_table(data['table'], list(data['categories']), str(data['column']))
+
+    def codes(self, id_site):
+        """Category codes for an array of site ids (``UNKNOWN`` for unknown sites)."""
+        id_site = np.asarray(id_site)
+        known = (id_site >= 0) & (id_site < len(self.table))
+        if known.all():
+            return self.table.take(id_site)
+        codes = np.full(len(id_site), UNKNOWN, dtype=self.table.dtype)
+        codes[known] = self.table.take(id_site[known])
+        return codes
+
+    def categorical(self, id_site):
+        """``pd.Categorical`` of the looked-up values, NaN for unknown sites."""
+        return pd.Categorical.from_codes(self.codes(id_site), categories=self.categories)
+
+    def attach(self, clicks):
+        """Return ``clicks`` with the lookup column added (no other column is copied)."""
+        result = clicks.copy(deep=False)
+        result[self.column] = self.categorical(clicks['id_site'].to_numpy())
+        return result
+
+
+def merge_checked(left, right, on, how='left', validate='many_to_one', name=None, report=None, **kwargs):
+    """``pd.merge`` with a cardinality check and a row-count report.
+
+    ``validate`` is passed to ``pd.merge``, which raises ``pandas.errors.MergeError``
+    if the keys do not have the expected cardinality (e.g. a duplicated enrolment in
+    the right table of a ``many_to_one`` join). The row counts before and after the
+    join are logged and, if ``report`` is a list, appended to it as a dict.
+    """
+    merged = pd.merge(left, right, on=on, how=how, validate=validate, **kwargs)
+    entry = {
+        'name': name or f"merge on {on}",
+        'how': how,
+        'left_rows': len(left),
+        'right_rows': len(right),
+        'result_rows': len(merged),
+        'row_change': len(merged) - len(left),
+    }
+    logger.info("%(name)s: %(left_rows)d x %(right_rows)d rows -> %(result_rows)d (%(row_change)+d)", entry)
+    if report is not None:
+        report.append(entry)
+    return merged
+
+
+def reconcile_withdrawals(registration, student_info, key=ENROLMENT_KEY, report=None):
+    """Set ``final_result`` to Withdrawn for enrolments that unregistered but are not marked so.
+
+    The unregistered enrolments of ``registration`` are looked up in a MultiIndex on the
+    enrolment ``key`` of ``student_info`` (one hash lookup per registration row), and only
+    the conflicting rows of the ``final_result`` column are rewritten. Returns the updated
+    copy of ``student_info``; the number of changed rows is logged and, if ``report`` is
+    a list, appended to it as a dict.
+    """
+    index = pd.MultiIndex.from_frame(student_info[key])
+    if not index.is_unique:
+        raise ValueError(f"student_info has duplicated {key} enrolments")
+    unregistered = registration.loc[registration['date_unregistration'].notna(), key]
+    positions = index.get_indexer(pd.MultiIndex.from_frame(unregistered))
+    positions = positions[positions >= 0]
+    conflicts = positions[student_info['final_result'].to_numpy()[positions] != WITHDRAWN]
+
+    student_info = student_info.copy()
+    student_info.iloc[conflicts, student_info.columns.get_loc('final_result')] = WITHDRAWN
+    entry = {'name': 'withdrawal reconciliation', 'unregistered': len(positions), 'changed_rows': len(conflicts)}
+    logger.info("%(name)s: %(unregistered)d unregistered enrolments, %(changed_rows)d set to Withdrawn", entry)
+    if report is not None:
+        report.append(entry)
+    return student_info
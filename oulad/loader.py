@@ -0,0 +1,200 @@
+"""Typed, chunked CSV loading for the OULAD tables with a columnar on-disk cache.
+
+Every table is read with an explicit schema so that repeated loads do not have to
+re-infer dtypes. The first load of a table writes a Parquet copy next to the data
+(or into ``cache_dir``); later loads reuse it as long as the source CSV is unchanged.
+"""
+
+import hashlib
+import json
+import os
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+try:
+    import pyarrow  # noqa: F401 (only needed for the Parquet cache)
+    HAVE_PYARROW = True
+except ImportError:
+    HAVE_PYARROW = False
+
+
+# Bump this whenever SCHEMAS changes so that old cache files are not reused.
+SCHEMA_VERSION = 1
+
+CHUNK_SIZE = 1_000_000
+
+# Key of one student's enrolment on a module presentation.
+ENROLMENT_KEY = ['code_module', 'code_presentation', 'id_student']
+# Key of one module presentation (a row of courses).
+PRESENTATION_KEY = ['code_module', 'code_presentation']
+
+FILES = {
+    'courses': 'courses.csv',
+    'studentInfo': 'studentInfo.csv',
+    'studentRegistration': 'studentRegistration.csv',
+    'moodle': 'moodle.csv',
+    'studentMoodleInteract': 'studentMoodleInteract.csv',
+}
+
+# Explicit per-table dtypes. Module/presentation/activity/region codes are stored as
+# categoricals, click columns as small ints and registration dates as nullable ints.
+SCHEMAS = {
+    'courses': {
+        'code_module': 'category',
+        'code_presentation': 'category',
+        'module_presentation_length': 'int16',
+    },
+    'studentInfo': {
+        'code_module': 'category',
+        'code_presentation': 'category',
+        'id_student': 'int32',
+        'gender': 'str',
+        'region': 'category',
+        'highest_education': 'str',
+        'imd_band': 'str',
+        'age_band': 'str',
+        'num_of_prev_attempts': 'int8',
+        'studied_credits': 'int16',
+        'disability': 'str',
+        'final_result': 'str',
+    },
+    'studentRegistration': {
+        'code_module': 'category',
+        'code_presentation': 'category',
+        'id_student': 'int32',
+        'date_registration': 'Int16',
+        'date_unregistration': 'Int16',
+    },
+    'moodle': {
+        'id_site': 'int32',
+        'code_module': 'category',
+        'code_presentation': 'category',
+        'activity_type': 'category',
+        'week_from': 'Int8',
+        'week_to': 'Int8',
+    },
+    'studentMoodleInteract': {
+        'code_module': 'category',
+        'code_presentation': 'category',
+        'id_student': 'int32',
+        'id_site': 'int32',
+        'date': 'int16',
+        'sum_click': 'int16',
+    },
+}
+
+
+def table_path(name, data_root):
+    """Return the CSV path of table ``name`` under ``data_root``."""
+    if name not in FILES:
+        raise KeyError(f"Unknown table {name!r}; expected one of {sorted(FILES)}")
+    return os.path.join(data_root, FILES[name])
+
+
+def file_hash(path, block_size=1 << 20):
+    """SHA-1 of a file's contents, read in blocks so large files are not held in memory."""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def iter_csv_chunks(path, name, chunksize=CHUNK_SIZE):
+    """Yield typed chunks of a CSV; category dictionaries may differ between chunks."""
+    schema = SCHEMAS[name]
+    return pd.read_csv(path, dtype=schema, usecols=list(schema), chunksize=chunksize)
+
+
+def read_csv_typed(path, name, chunksize=CHUNK_SIZE):
+    """Read a CSV in chunks using the schema of table ``name``.
+
+    Categorical columns are parsed per chunk and then combined with
+    ``union_categoricals`` so the result keeps a single, sorted category dictionary
+    instead of falling back to object columns.
+    """
+    schema = SCHEMAS[name]
+    chunks = list(iter_csv_chunks(path, name, chunksize))
+    if not chunks:
+        return pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in schema.items()})
+    if len(chunks) == 1:
+        df = chunks[0]
+    else:
+        columns = {}
+        for col, dtype in schema.items():
+            parts = [chunk[col] for chunk in chunks]
+            if dtype == 'category':
+                columns[col] = pd.Series(union_categoricals(parts, sort_categories=True), name=col)
+            else:
+                columns[col] = pd.concat(parts, ignore_index=True)
+        df = pd.DataFrame(columns)
+    # Sorted dictionaries make the category codes identical between loads.
+    for col, dtype in schema.items():
+        if dtype == 'category' and not df[col].cat.categories.is_monotonic_increasing:
+            df[col] = df[col].cat.reorder_categories(df[col].cat.categories.sort_values())
+    return df[list(schema)].reset_index(drop=True)
+
+
+def _cache_paths(name, cache_dir):
+    base = os.path.join(cache_dir, name)
+    return base + '.parquet', base + '.json'
+
+
+def source_signature(path):
+    """Schema version, mtime and size of ``path``; used to detect stale derived files."""
+    stat = os.stat(path)
+    return {'schema_version': SCHEMA_VERSION, 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+
+
+def _cache_is_valid(path, meta_path, cache_file):
+    """Check the cache sidecar against the source CSV.
+
+    A matching mtime and size is enough. If only the mtime moved (e.g. the file was
+    copied), the content hash decides and the sidecar is refreshed on a match.
+    """
+    if not (os.path.exists(cache_file) and os.path.exists(meta_path)):
+        return False
+    with open(meta_path) as f:
+        cached = json.load(f)
+    current = source_signature(path)
+    if cached.get('schema_version') != current['schema_version'] or cached.get('size') != current['size']:
+        return False
+    if cached.get('mtime_ns') == current['mtime_ns']:
+        return True
+    if cached.get('sha1') != file_hash(path):
+        return False
+    cached['mtime_ns'] = current['mtime_ns']
+    with open(meta_path, 'w') as f:
+        json.dump(cached, f)
+    return True
+
+
+def load_table(name, data_root, cache_dir=None, use_cache=True, chunksize=CHUNK_SIZE):
+    """Load OULAD table ``name`` from ``data_root`` with its typed schema.
+
+    With ``use_cache`` (and pyarrow installed) the parsed table is stored as Parquet in
+    ``cache_dir`` (default: ``<data_root>/.cache``) and reused until the CSV changes.
+    """
+    path = table_path(name, data_root)
+    if not (use_cache and HAVE_PYARROW):
+        return read_csv_typed(path, name, chunksize=chunksize)
+
+    cache_dir = cache_dir or os.path.join(data_root, '.cache')
+    cache_file, meta_path = _cache_paths(name, cache_dir)
+    if _cache_is_valid(path, meta_path, cache_file):
+        return pd.read_parquet(cache_file)
+
+    df = read_csv_typed(path, name, chunksize=chunksize)
+    os.makedirs(cache_dir, exist_ok=True)
+    df.to_parquet(cache_file, index=False)
+    meta = source_signature(path)
+    meta['sha1'] = file_hash(path)
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f)
+    return df
+
+
+def load_all(data_root, cache_dir=None, use_cache=True):
+    """Load every OULAD table into a dict keyed by table name."""
+    return {name: load_table(name, data_root, cache_dir=cache_dir, use_cache=use_cache) for name in FILES}
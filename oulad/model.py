@@ -0,0 +1,131 @@
+"""Section 2.3: logistic regression on ``final_result`` with k-fold cross-validation.
+
+The folds are independent, so they are fitted in parallel worker processes with joblib.
+Every fold returns its confusion matrix, one-vs-rest AUCs and coefficients; the
+out-of-fold predictions are pooled into an overall confusion matrix and AUCs.
+"""
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from scipy import sparse
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import confusion_matrix, roc_auc_score
+from sklearn.model_selection import StratifiedKFold
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+from oulad.features import engagement_features
+from oulad.loader import ENROLMENT_KEY
+
+TARGET = 'final_result'
+ENGAGEMENT_COLUMNS = ['n_components', 'at_least_three_components', 'average_clicks', 'clicked_all_components']
+
+
+def align_click_matrix(click_matrix, click_enrolments, enrolments):
+    """Rows of ``click_matrix`` in the order of ``enrolments``; all-zero rows for no clicks."""
+    positions = click_enrolments[ENROLMENT_KEY].assign(_row=np.arange(len(click_enrolments)))
+    rows = enrolments[ENROLMENT_KEY].merge(positions, on=ENROLMENT_KEY, how='left', validate='one_to_one')['_row']
+    padded = sparse.vstack([click_matrix, sparse.csr_matrix((1, click_matrix.shape[1]))], format='csr')
+    return padded[rows.fillna(click_matrix.shape[0]).to_numpy(dtype=np.int64)]
+
+
+def assemble_features(student_info, encoder, clicks):
+    """Demographic dummies, clicks per activity type and engagement features as one CSR matrix.
+
+    ``clicks`` holds the click matrix rows of the ``student_info`` enrolments, in order.
+    """
+    engagement = engagement_features(clicks, student_info[ENROLMENT_KEY])[ENGAGEMENT_COLUMNS]
+    return sparse.hstack([
+        encoder.transform(student_info).astype(np.float64),
+        clicks,
+        sparse.csr_matrix(engagement.to_numpy(dtype=np.float64)),
+    ], format='csr')
+
+
+def feature_names(encoder, click_activities):
+    return encoder.feature_names + [f'clicks_{a}' for a in click_activities] + ENGAGEMENT_COLUMNS
+
+
+def build_design_matrix(student_info, encoder, click_matrix, click_enrolments, click_activities, target=TARGET):
+    """Sparse design matrix and target for every enrolment of ``student_info``.
+
+    Columns are the demographic dummies of the fitted ``encoder``, the clicks per
+    activity type and the engagement features. The encoder must not encode the target
+    (``final_result`` dummies would leak it). Returns ``(X, y, feature_names)``.
+    """
+    if target in encoder.columns:
+        raise ValueError(f"The encoder includes the target column {target!r}")
+    clicks = align_click_matrix(click_matrix, click_enrolments, student_info)
+    X = assemble_features(student_info, encoder, clicks)
+    return X, student_info[target].to_numpy(), feature_names(encoder, click_activities)
+
+
+def make_model(max_iter=1000):
+    # with_mean=False keeps the design matrix sparse.
+    return make_pipeline(StandardScaler(with_mean=False), LogisticRegression(max_iter=max_iter))
+
+
+def fit_model(X, y, max_iter=1000):
+    """Fit the logistic regression on all enrolments (e.g. to persist it for scoring)."""
+    return make_model(max_iter).fit(X, y)
+
+
+def _one_vs_rest_auc(y, proba, classes):
+    aucs = {}
+    for k, label in enumerate(classes):
+        positive = y == label
+        aucs[label] = roc_auc_score(positive, proba[:, k]) if 0 < positive.sum() < len(y) else np.nan
+    return aucs
+
+
+def _fit_fold(X, y, train, test, classes, max_iter):
+    model = make_model(max_iter).fit(X[train], y[train])
+    # Reorder probabilities in case a class is missing from this training fold.
+    proba = np.zeros((len(test), len(classes)))
+    fitted = list(model.classes_)
+    proba[:, [classes.index(c) for c in fitted]] = model.predict_proba(X[test])
+    predicted = np.asarray(classes)[proba.argmax(axis=1)]
+    coefficients = np.zeros((len(classes), X.shape[1]))
+    coef = model[-1].coef_
+    if len(fitted) == 2:
+        coef = np.vstack([-coef[0], coef[0]])
+    coefficients[[classes.index(c) for c in fitted]] = coef
+    return {
+        'test': test,
+        'proba': proba,
+        'confusion_matrix': confusion_matrix(y[test], predicted, labels=classes),
+        'auc': _one_vs_rest_auc(y[test], proba, classes),
+        'coefficients': coefficients,
+    }
+
+
+def cross_validate(X, y, feature_names=None, n_splits=10, n_jobs=-1, random_state=0, max_iter=1000):
+    """Stratified k-fold cross-validation of the logistic regression, folds in parallel.
+
+    ``n_jobs`` is the number of worker processes (-1: one per core). Returns a dict
+    with ``classes``, per-fold ``fold_confusion_matrices`` and ``fold_auc``, the pooled
+    ``confusion_matrix`` and ``auc`` of the out-of-fold predictions, and
+    ``coefficients`` (mean standardized coefficient per class and feature).
+    """
+    classes = sorted(pd.unique(y))
+    folds = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=random_state).split(np.zeros(len(y)), y)
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(_fit_fold)(X, y, train, test, classes, max_iter) for train, test in folds)
+
+    proba = np.zeros((len(y), len(classes)))
+    for fold in results:
+        proba[fold['test']] = fold['proba']
+    names = feature_names if feature_names is not None else [f'x{i}' for i in range(X.shape[1])]
+    index = pd.Index(range(1, len(results) + 1), name='fold')
+    return {
+        'classes': classes,
+        'fold_confusion_matrices': [
+            pd.DataFrame(fold['confusion_matrix'], index=classes, columns=classes) for fold in results],
+        'fold_auc': pd.DataFrame([fold['auc'] for fold in results], index=index, columns=classes),
+        'confusion_matrix': pd.DataFrame(
+            sum(fold['confusion_matrix'] for fold in results), index=classes, columns=classes),
+        'auc': pd.Series(_one_vs_rest_auc(y, proba, classes)),
+        'coefficients': pd.DataFrame(
+            np.mean([fold['coefficients'] for fold in results], axis=0), index=classes, columns=names),
+    }
@@ -0,0 +1,255 @@
+"""Headless version of the notebook's data preparation and feature steps.
+
+Each function mirrors one task of ``Data Scince Project.py`` without the printing and
+plotting, so the whole pipeline can be scheduled as a batch job with ``python -m oulad``.
+"""
+
+import os
+from functools import partial
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+
+from oulad import (aggregate, backends, binning, cleaning, clicklog, encoding, features, joins, loader, model,
+                   presentation)
+from oulad.aggregate import FINE_KEY, click_rollups, fine_grain, stream_fine_grain
+from oulad.backends import get_backend
+from oulad.binning import REGISTRATION_TIMING, UNREGISTRATION_TIMING, assign_bins
+from oulad.cleaning import AGE_MERGES, EDUCATION_MERGES, clean_student_info
+from oulad.clicklog import ClickLog, open_click_log
+from oulad.encoding import CategoricalEncoder
+from oulad.features import build_click_matrix, engagement_features
+from oulad.joins import SiteLookup, merge_checked, reconcile_withdrawals
+from oulad.loader import CHUNK_SIZE, ENROLMENT_KEY, PRESENTATION_KEY, load_table, table_path
+from oulad.model import build_design_matrix, fit_model
+from oulad.scoring import save_model
+from oulad.stages import StageGraph
+
+# Tables loaded whole; the click log is read through ``open_click_log``.
+SMALL_TABLES = ['courses', 'studentInfo', 'studentRegistration', 'moodle']
+# Section 1.3 TASK2/TASK3 bins.
+REGISTRATION_BINS = (REGISTRATION_TIMING, UNREGISTRATION_TIMING)
+
+
+def load_tables(data_root, cache_dir=None, use_cache=True):
+    """Load the small tables; the click log is read through ``open_click_log``."""
+    return {name: load_table(name, data_root, cache_dir, use_cache) for name in SMALL_TABLES}
+
+
+def categorize_registration(registration, specs=REGISTRATION_BINS):
+    """Add the registration/unregistration timing categories."""
+    return assign_bins(registration, list(specs))
+
+
+def clicks_with_result(clicks_by_activity, student_info):
+    """Section 1.5 TASK5: attach each enrolment's final_result to its activity clicks."""
+    return merge_checked(clicks_by_activity, student_info[ENROLMENT_KEY + ['final_result']], on=ENROLMENT_KEY,
+                         how='left', validate='many_to_one', name='clicks_by_activity x studentInfo')
+
+
+def train_model(student_info, clicks_by_activity, lookup):
+    """Section 2.3: fit the model on all enrolments.
+
+    Returns the model, encoder, site lookup and activity columns, i.e. the arguments
+    ``save_model`` stores for ``oulad.scoring``.
+    """
+    encoder = CategoricalEncoder().fit(student_info)
+    matrix, enrolments, activities = build_click_matrix(clicks_by_activity)
+    X, y, _ = build_design_matrix(student_info, encoder, matrix, enrolments, activities)
+    return fit_model(X, y), encoder, lookup, activities
+
+
+def add_engagement_features(pivot_clicks, clicks_by_activity):
+    """pivot_clicks with the engagement features of each enrolment's click vector."""
+    matrix, enrolments, _ = build_click_matrix(clicks_by_activity)
+    engagement = engagement_features(matrix, enrolments).drop(columns='n_components')
+    return pivot_clicks.merge(engagement, on=ENROLMENT_KEY, how='left')
+
+
+def shard_keys(courses):
+    """The (code_module, code_presentation) pairs the pipeline can be sharded by."""
+    return list(courses[PRESENTATION_KEY].astype(str).itertuples(index=False, name=None))
+
+
+def _shard_rows(df, key):
+    module, presentation = key
+    return df[(df['code_module'] == module) & (df['code_presentation'] == presentation)]
+
+
+def _run_shard(rows, store_dir, lookup, student_info, registration):
+    """Per-presentation work: clean the shard's rows and aggregate its clicks.
+
+    Runs in a worker process; the click rows at positions ``rows`` are read from the
+    memory-mapped store. ``student_info`` and ``registration`` hold only the shard's
+    rows, with their original index, so the parent can restore the unsharded row order.
+    """
+    clicks = ClickLog(store_dir).to_frame(rows=rows)
+    return {
+        'fine': fine_grain(clicks, lookup),
+        'clicks': len(clicks),
+        'studentInfo': clean_student_info(student_info.rename_axis('_row').reset_index()),
+        'studentRegistration': categorize_registration(registration),
+    }
+
+
+def _run_sharded(tables, log, lookup, n_jobs):
+    """Clean and aggregate every presentation on a process pool and concatenate the shards.
+
+    Returns the fine-grain clicks and the cleaned studentInfo and studentRegistration.
+    """
+    keys = shard_keys(tables['courses'])
+    student_info = [_shard_rows(tables['studentInfo'], key) for key in keys]
+    registration = [_shard_rows(tables['studentRegistration'], key) for key in keys]
+    for name, shards in [('studentInfo', student_info), ('studentRegistration', registration)]:
+        if sum(len(shard) for shard in shards) != len(tables[name]):
+            raise ValueError(f"{name} has presentations that are not in the courses table")
+
+    # One pass over the log bins the click rows by presentation, instead of a scan per shard.
+    rows = log.group_rows(PRESENTATION_KEY)
+    no_rows = np.empty(0, dtype=np.int64)
+    shards = Parallel(n_jobs=n_jobs)(
+        delayed(_run_shard)(rows.get(key, no_rows), log.store_dir, lookup, info, reg)
+        for key, info, reg in zip(keys, student_info, registration))
+    if sum(shard['clicks'] for shard in shards) != len(log):
+        raise ValueError("The click log has presentations that are not in the courses table")
+
+    fine = pd.concat([shard['fine'] for shard in shards]).sort_values(FINE_KEY, ignore_index=True)
+    student_info = (pd.concat([shard['studentInfo'] for shard in shards])
+                    .sort_values('_row').drop(columns='_row').reset_index(drop=True))
+    registration = pd.concat([shard['studentRegistration'] for shard in shards]).sort_index()
+    return {'fine': fine, 'studentInfo': student_info, 'studentRegistration': registration}
+
+
+def _backend_click_rollups(backend, data_root):
+    return get_backend(backend, data_root).click_rollups()
+
+
+def _backend_clicks_with_result(clicks_by_activity, student_info, backend, data_root):
+    return get_backend(backend, data_root).clicks_with_result(clicks_by_activity, student_info)
+
+
+def _save_model(model_dir, trained):
+    save_model(model_dir, *trained)
+
+
+def pipeline_stages(data_root, cache_dir=None, use_cache=True, model_dir=None, n_jobs=None, stream=False,
+                    chunksize=CHUNK_SIZE, backend='pandas'):
+    """The pipeline as a ``StageGraph``; see ``run`` for the arguments.
+
+    Each stage declares the stages it reads, the csv files it parses and the modules
+    its result depends on, so a stage cache can tell which stages an edit affects.
+    """
+    if stream and n_jobs is not None:
+        raise ValueError("Streaming mode reads the click CSV sequentially and cannot be sharded (n_jobs)")
+    if backend != 'pandas' and (stream or n_jobs is not None):
+        raise ValueError(f"The {backend} backend replaces the click aggregation; it cannot be streamed or sharded")
+    clicks_csv = table_path('studentMoodleInteract', data_root)
+    graph = StageGraph()
+    graph.add('load', partial(load_tables, data_root, cache_dir, use_cache),
+              files=[table_path(name, data_root) for name in SMALL_TABLES], code=[loader])
+    graph.add('site_lookup', SiteLookup, ['load.moodle'], code=[joins], cache=False)
+    if n_jobs is None:
+        graph.add('clean_student_info', clean_student_info, ['load.studentInfo'],
+                  params={'education_merges': EDUCATION_MERGES, 'age_merges': AGE_MERGES})
+        graph.add('categorize_registration', categorize_registration, ['load.studentRegistration'],
+                  params={'specs': REGISTRATION_BINS}, code=[binning])
+        student_info = 'clean_student_info'
+        if backend != 'pandas':
+            graph.add('click_rollups', partial(_backend_click_rollups, data_root=data_root),
+                      params={'backend': backend}, files=[clicks_csv, table_path('moodle', data_root)], code=[backends])
+        elif stream:
+            graph.add('stream_fine_grain', partial(stream_fine_grain, clicks_csv, chunksize=chunksize),
+                      ['site_lookup'], files=[clicks_csv], code=[aggregate])
+            fine = 'stream_fine_grain'
+        else:
+            graph.add('open_click_log', partial(open_click_log, data_root, cache_dir), files=[clicks_csv], cache=False)
+            graph.add('fine_grain', fine_grain, ['open_click_log', 'site_lookup'], code=[aggregate, clicklog])
+            fine = 'fine_grain'
+    else:
+        graph.add('open_click_log', partial(open_click_log, data_root, cache_dir), files=[clicks_csv], cache=False)
+        graph.add('shards', partial(_run_sharded, n_jobs=n_jobs), ['load', 'open_click_log', 'site_lookup'],
+                  code=[cleaning, binning, aggregate, clicklog])
+        fine, student_info = 'shards.fine', 'shards.studentInfo'
+    graph.add('reconcile_withdrawals', reconcile_withdrawals, ['load.studentRegistration', student_info],
+              code=[joins])
+
+    if backend == 'pandas':
+        graph.add('click_rollups', click_rollups, [fine], code=[aggregate, presentation])
+        graph.add('clicks_with_result', clicks_with_result,
+                  ['click_rollups.clicks_by_activity', 'reconcile_withdrawals'], code=[joins])
+    else:
+        graph.add('clicks_with_result', partial(_backend_clicks_with_result, data_root=data_root),
+                  ['click_rollups.clicks_by_activity', 'reconcile_withdrawals'], params={'backend': backend},
+                  code=[backends])
+    graph.add('engagement_features', add_engagement_features,
+              ['click_rollups.pivot_clicks', 'click_rollups.clicks_by_activity'], code=[features])
+    if model_dir:
+        graph.add('train_model', train_model,
+                  ['reconcile_withdrawals', 'click_rollups.clicks_by_activity', 'site_lookup'],
+                  code=[encoding, features, model])
+        graph.add('save_model', partial(_save_model, model_dir), ['train_model'], cache=False)
+    return graph
+
+
+def run(data_root, cache_dir=None, use_cache=True, model_dir=None, n_jobs=None, profiler=None, stream=False,
+        chunksize=CHUNK_SIZE, backend='pandas', stage_cache=None):
+    """Run every step and return the result tables keyed by name.
+
+    With ``model_dir`` the Section 2.3 model is also trained and saved there. With
+    ``n_jobs`` the cleaning and click aggregation run per (code_module,
+    code_presentation) shard on that many worker processes (-1: one per core); the
+    cross-presentation steps (withdrawal reconciliation, rollups, click matrix) then
+    run once on the concatenated, much smaller shard results. The outputs are the
+    same as without sharding (see ``check_sharding``).
+
+    With ``stream`` the click CSV is aggregated directly, ``chunksize`` rows at a time,
+    without building the memory-mapped click store; peak memory then depends on the
+    chunk size rather than on the size of the log. The outputs are the same.
+
+    ``backend`` selects the engine of the click rollups and the final_result join (see
+    ``oulad.backends``); 'duckdb' runs them as multithreaded queries over the csv files.
+
+    With ``stage_cache`` (a ``StageCache``) the output of every stage is cached under a
+    hash of its code, parameters and inputs, and a rerun only computes the stages
+    affected by what changed since.
+
+    Each step is recorded as a stage of ``profiler`` (a ``StageProfiler``) if given.
+    """
+    graph = pipeline_stages(data_root, cache_dir, use_cache, model_dir, n_jobs, stream, chunksize, backend)
+    registration = 'categorize_registration' if n_jobs is None else 'shards.studentRegistration'
+    targets = ['reconcile_withdrawals', registration, 'click_rollups', 'clicks_with_result',
+               'engagement_features'] + (['save_model'] if model_dir else [])
+    values = graph.run(targets, stage_cache, profiler)
+    outputs = {'studentInfo': values['reconcile_withdrawals'], 'studentRegistration': values[registration]}
+    outputs.update(values['click_rollups'])
+    outputs['final_merged'] = values['clicks_with_result']
+    outputs['pivot_clicks'] = values['engagement_features']
+    return outputs
+
+
+def check_sharding(data_root, n_jobs=-1, cache_dir=None, use_cache=True):
+    """Run the pipeline with and without sharding and compare every output table.
+
+    Returns the names of the tables that differ (empty when the runs agree).
+    """
+    unsharded = run(data_root, cache_dir, use_cache)
+    sharded = run(data_root, cache_dir, use_cache, n_jobs=n_jobs)
+    mismatches = []
+    for name, df in unsharded.items():
+        try:
+            pd.testing.assert_frame_equal(sharded[name], df)
+        except AssertionError:
+            mismatches.append(name)
+    return mismatches
+
+
+def write_outputs(outputs, output_dir):
+    """Write every result table to ``output_dir`` as csv; returns the written paths."""
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for name, df in outputs.items():
+        path = os.path.join(output_dir, f'{name}.csv')
+        df.to_csv(path, index=False)
+        paths.append(path)
+    return paths
@@ -0,0 +1,68 @@
+"""Parsing of ``code_presentation`` codes such as ``2013J``.
+
+A code is the year followed by the start month: ``B`` for February and ``J`` for
+October. There are only a handful of distinct codes, so they are parsed once on the
+categorical dictionary and broadcast to the rows through the category codes.
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+SEMESTERS = ['B', 'J']
+START_MONTHS = {'B': 'February', 'J': 'October'}
+
+_CODE = re.compile(r'^(\d{4})([BJ])$')
+
+
+def _parse_code(code):
+    match = _CODE.match(code)
+    if match is None:
+        raise ValueError(f"Invalid code_presentation {code!r}; expected e.g. '2013B' or '2014J'")
+    return int(match.group(1)), match.group(2)
+
+
+def parse_presentations(code_presentation):
+    """Year, semester and ordinal of every value of ``code_presentation``.
+
+    Returns a DataFrame aligned with the input with ``year`` (int16), ``semester``
+    (categorical ``B``/``J``) and ``presentation_ordinal`` (``2 * year + semester``,
+    so presentations sort chronologically). Missing codes give -1 / NaN.
+    """
+    values = pd.Series(code_presentation)
+    if not isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype('category')
+    parsed = [_parse_code(code) for code in values.cat.categories]
+    years = np.array([year for year, _ in parsed] + [-1], dtype=np.int16)
+    semesters = np.array([SEMESTERS.index(semester) for _, semester in parsed] + [-1], dtype=np.int8)
+
+    # Code -1 (missing) indexes the trailing -1 entries.
+    codes = values.cat.codes.to_numpy()
+    year = years[codes]
+    semester = semesters[codes]
+    ordinal = np.where(codes >= 0, 2 * year.astype(np.int32) + semester, -1)
+    return pd.DataFrame({
+        'year': year,
+        'semester': pd.Categorical.from_codes(semester, categories=SEMESTERS),
+        'presentation_ordinal': ordinal,
+    }, index=values.index)
+
+
+def presentation_year(code_presentation):
+    """Year of each presentation code as a Series aligned with the input."""
+    return parse_presentations(code_presentation)['year']
+
+
+def presentation_semester(code_presentation):
+    """Start semester (``B`` or ``J``) of each presentation code."""
+    return parse_presentations(code_presentation)['semester']
+
+
+def add_presentation_columns(df, column='code_presentation'):
+    """Return ``df`` with ``year``, ``semester`` and ``presentation_ordinal`` columns added."""
+    parsed = parse_presentations(df[column])
+    result = df.copy(deep=False)
+    for name in parsed:
+        result[name] = parsed[name].to_numpy()
+    return result
@@ -0,0 +1,149 @@
+"""Per-stage timing and memory instrumentation for pipeline runs.
+
+``StageProfiler.stage`` wraps one named step and records its wall time, CPU time,
+growth of the peak resident set size and input/output row counts; ``write_report``
+writes the records as JSON and CSV. For one selected stage the profiler can also
+capture a cProfile dump and a tracemalloc snapshot of the top allocation sites.
+
+Times and memory are those of the calling process: work done in worker processes
+(``n_jobs``) shows up as wall time only.
+"""
+
+import cProfile
+import json
+import os
+import pstats
+import resource
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from oulad.clicklog import ClickLog
+
+REPORT_FILE = 'stages'
+TOP_ALLOCATIONS = 25
+
+# ru_maxrss is in KiB on Linux but in bytes on macOS.
+_MAXRSS_UNIT = 1 if sys.platform == 'darwin' else 1024
+
+
+def _peak_rss():
+    """Peak resident set size of this process so far, in bytes."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _MAXRSS_UNIT
+
+
+def count_rows(obj):
+    """Row count of a DataFrame/Series/array/sparse matrix/click log, or the total over a dict, list or tuple.
+
+    Other objects (models, encoders, column labels) have no rows: they count as None and
+    are left out of totals, and a container with no tables in it counts as None.
+    """
+    if isinstance(obj, dict):
+        obj = list(obj.values())
+    if isinstance(obj, (list, tuple)):
+        counts = [count for count in map(count_rows, obj) if count is not None]
+        return sum(counts) if counts else None
+    if isinstance(obj, (pd.DataFrame, pd.Series, np.ndarray)) or sparse.issparse(obj):
+        return int(obj.shape[0]) if obj.ndim else None
+    if isinstance(obj, ClickLog):
+        return len(obj)
+    return None
+
+
+class Stage:
+    """Record of one stage; set ``rows_out`` (or call ``output``) inside the ``with`` block."""
+
+    def __init__(self, name, rows_in=None):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.wall_s = None
+        self.cpu_s = None
+        self.peak_rss_delta_mib = None
+        # Set when the output was read from a stage cache instead of computed.
+        self.cached = False
+
+    def output(self, obj):
+        """Record the row count of ``obj`` as the stage output and return ``obj`` unchanged."""
+        self.rows_out = count_rows(obj)
+        return obj
+
+    def to_dict(self):
+        return {
+            'stage': self.name,
+            'wall_s': self.wall_s,
+            'cpu_s': self.cpu_s,
+            'peak_rss_delta_mib': self.peak_rss_delta_mib,
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out,
+            'cached': self.cached,
+        }
+
+
+class StageProfiler:
+    """Collects ``Stage`` records for one run.
+
+    ``profile_stage`` names a stage to also run under cProfile and tracemalloc; the
+    dumps are written to ``profile_dir`` (``<stage>.prof`` and ``<stage>.tracemalloc.txt``).
+    """
+
+    def __init__(self, profile_stage=None, profile_dir='.'):
+        self.profile_stage = profile_stage
+        self.profile_dir = profile_dir
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name, inputs=None):
+        """Instrument the enclosed block as stage ``name``; ``inputs`` gives ``rows_in``."""
+        record = Stage(name, count_rows(inputs))
+        deep = name == self.profile_stage
+        if deep:
+            tracemalloc.start()
+            profile = cProfile.Profile()
+            profile.enable()
+        rss = _peak_rss()
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield record
+        finally:
+            record.wall_s = time.perf_counter() - wall
+            record.cpu_s = time.process_time() - cpu
+            record.peak_rss_delta_mib = (_peak_rss() - rss) / 2 ** 20
+            if deep:
+                profile.disable()
+                snapshot = tracemalloc.take_snapshot()
+                traced_peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                self._write_profile(name, profile, snapshot, traced_peak)
+            self.stages.append(record)
+
+    def _write_profile(self, name, profile, snapshot, traced_peak):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        profile.dump_stats(os.path.join(self.profile_dir, f'{name}.prof'))
+        with open(os.path.join(self.profile_dir, f'{name}.tracemalloc.txt'), 'w') as f:
+            f.write(f'traced peak: {traced_peak / 2 ** 20:.1f} MiB\n')
+            for statistic in snapshot.statistics('lineno')[:TOP_ALLOCATIONS]:
+                f.write(f'{statistic}\n')
+            f.write('\n')
+            pstats.Stats(profile, stream=f).sort_stats('cumulative').print_stats(TOP_ALLOCATIONS)
+
+    def report(self):
+        """The stage records as a DataFrame, in execution order."""
+        report = pd.DataFrame([stage.to_dict() for stage in self.stages], columns=list(Stage('').to_dict()))
+        return report.astype({'rows_in': 'Int64', 'rows_out': 'Int64'})
+
+    def write_report(self, output_dir):
+        """Write ``stages.json`` and ``stages.csv`` to ``output_dir``; returns the paths."""
+        os.makedirs(output_dir, exist_ok=True)
+        json_path = os.path.join(output_dir, REPORT_FILE + '.json')
+        csv_path = os.path.join(output_dir, REPORT_FILE + '.csv')
+        with open(json_path, 'w') as f:
+            json.dump([stage.to_dict() for stage in self.stages], f, indent=2)
+        self.report().to_csv(csv_path, index=False)
+        return [json_path, csv_path]
@@ -0,0 +1,265 @@
+"""One-pass data-quality profile of the OULAD tables.
+
+Replaces the ``info()`` / ``describe()`` / ``df[df.duplicated()]`` / ``isnull().sum()``
+cells with a single vectorized scan per table. Every column is turned into integer
+codes once (category codes, offsets of small-range integers, or ``pd.factorize`` codes,
+with 0 for missing values); the null counts and cardinalities come from those codes, and
+min/max/mean/std from the numeric values. Rows are then keyed by combining the column
+codes, exactly (mixed radix) when the product of the cardinalities fits in 64 bits and
+with ``pd.util.hash_pandas_object`` otherwise. Counting repeated keys gives the duplicate
+rows, and the same over the table's key columns gives the duplicate keys, without
+hashing rows into Python objects. The click log is profiled block by block from its
+memory-mapped store (``profile_click_log``) and is never loaded as a DataFrame.
+
+Reports are cached as ``<cache_dir>/<table>.quality.json`` (``cache_dir`` defaults to
+``<data_root>/.cache``) and reused until the csv changes.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from oulad.clicklog import BLOCK_ROWS, open_click_log
+from oulad.loader import ENROLMENT_KEY, FILES, PRESENTATION_KEY, load_table, source_signature, table_path
+
+# Bump this whenever the report contents change so that old reports are not reused.
+QUALITY_VERSION = 2
+
+# Columns that should identify a row of each table (for the click log: one student's
+# clicks on one site on one day).
+TABLE_KEYS = {
+    'courses': PRESENTATION_KEY,
+    'studentInfo': ENROLMENT_KEY,
+    'studentRegistration': ENROLMENT_KEY,
+    'moodle': ['id_site'],
+    'studentMoodleInteract': ENROLMENT_KEY + ['id_site', 'date'],
+}
+
+# Integer columns whose value range is at most this wide are coded by offset, not factorized.
+DENSE_RANGE = 1 << 24
+STATISTICS = ['non_null', 'nulls', 'cardinality', 'min', 'max', 'mean', 'std']
+
+
+def _column_codes(values):
+    """Integer codes of a column (0 = missing), the number of codes and its statistics."""
+    stats = dict.fromkeys(['min', 'max', 'mean', 'std'])
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes = values.cat.codes.to_numpy().astype(np.int64) + 1
+        radix = len(values.cat.categories) + 1
+    elif pd.api.types.is_numeric_dtype(values.dtype) and not pd.api.types.is_bool_dtype(values.dtype):
+        missing = values.isna().to_numpy()
+        numbers = values.to_numpy(dtype=np.float64, na_value=np.nan)[~missing]
+        if len(numbers):
+            stats = {'min': numbers.min(), 'max': numbers.max(), 'mean': numbers.mean(),
+                     'std': numbers.std(ddof=1) if len(numbers) > 1 else np.nan}
+        integral = pd.api.types.is_integer_dtype(values.dtype)
+        if integral and len(numbers) and stats['max'] - stats['min'] < DENSE_RANGE:
+            codes = np.zeros(len(values), dtype=np.int64)
+            codes[~missing] = numbers.astype(np.int64) - int(stats['min']) + 1
+            radix = int(stats['max'] - stats['min']) + 2
+        else:
+            factorized, uniques = pd.factorize(values)
+            codes, radix = factorized.astype(np.int64) + 1, len(uniques) + 1
+    else:
+        factorized, uniques = pd.factorize(values)
+        codes, radix = factorized.astype(np.int64) + 1, len(uniques) + 1
+    return codes, radix, stats
+
+
+def _row_keys(blocks, radices, n_rows):
+    """One int64 key per row from consecutive blocks of column codes (lists of arrays)."""
+    exact = np.prod([float(radix) for radix in radices]) < 2 ** 63
+    keys = np.empty(n_rows, dtype=np.int64 if exact else np.uint64)
+    start = 0
+    for codes in blocks:
+        if exact:
+            block = np.zeros(len(codes[0]), dtype=np.int64)
+            for column, radix in zip(codes, radices):
+                block = block * radix + column
+        else:
+            block = pd.util.hash_pandas_object(pd.DataFrame(dict(enumerate(codes))), index=False).to_numpy()
+        keys[start:start + len(block)] = block
+        start += len(block)
+    return keys
+
+
+def _duplicates(blocks, radices, n_rows):
+    """Number of rows whose combination of column codes already occurred above them."""
+    if not n_rows or not radices:
+        return 0
+    keys = _row_keys(blocks, radices, n_rows)
+    keys.sort()
+    return int(n_rows - 1 - np.count_nonzero(keys[1:] != keys[:-1]))
+
+
+def _number(value):
+    return None if value is None or pd.isna(value) else float(value)
+
+
+def _column_entry(name, dtype, n_rows, nulls, cardinality, stats):
+    return {
+        'column': name,
+        'dtype': dtype,
+        'non_null': int(n_rows - nulls),
+        'nulls': int(nulls),
+        'cardinality': int(cardinality),
+        **{stat: _number(value) for stat, value in stats.items()},
+    }
+
+
+def _report(n_rows, columns, duplicate_rows, key, duplicate_keys):
+    return {
+        'rows': n_rows,
+        'duplicate_rows': duplicate_rows,
+        'key': list(key) if key else None,
+        'duplicate_keys': duplicate_keys,
+        'columns': columns,
+    }
+
+
+def profile_frame(df, key=None):
+    """Quality report of a DataFrame: row/duplicate counts and per-column statistics.
+
+    ``key`` optionally names the columns that should be unique; ``duplicate_keys``
+    then counts the rows repeating an earlier key.
+    """
+    encoded = {col: _column_codes(df[col]) for col in df.columns}
+    columns = []
+    for col, (codes, radix, stats) in encoded.items():
+        present = np.bincount(codes, minlength=radix)
+        columns.append(_column_entry(col, str(df[col].dtype), len(df), present[0],
+                                     np.count_nonzero(present[1:]), stats))
+    duplicate_rows = _duplicates([[codes for codes, _, _ in encoded.values()]],
+                                 [radix for _, radix, _ in encoded.values()], len(df))
+    duplicate_keys = None
+    if key:
+        duplicate_keys = _duplicates([[encoded[col][0] for col in key]], [encoded[col][1] for col in key], len(df))
+    return _report(len(df), columns, duplicate_rows, key, duplicate_keys)
+
+
+def profile_click_log(log, key=None, block_rows=BLOCK_ROWS):
+    """``profile_frame`` of a ``ClickLog``, read block by block from its memory maps.
+
+    Categorical columns are stored as codes (-1 for missing values) and the integer
+    ranges are in the store's metadata, so nothing is materialized: besides one block,
+    memory holds one int64 row key per click and a count per distinct code. The integer
+    columns cannot hold nulls (the click schema rejects them when the csv is parsed), so
+    their null count is 0. The report equals ``profile_frame`` of the loaded table.
+    """
+    names = list(log.meta['dtypes'])
+    offsets, radices, columns = {}, {}, []
+    for name in names:
+        if name in log.categories:
+            # Codes shift by one so that the missing code -1, as stored, becomes 0.
+            offsets[name], radices[name] = -1, len(log.categories[name]) + 1
+        else:
+            lo, hi = log.value_range(name)
+            offsets[name], radices[name] = lo - 1, hi - lo + 2
+
+    def codes(name, start):
+        return log.column(name)[start:start + block_rows].astype(np.int64) - offsets[name]
+
+    for name in names:
+        dense = radices[name] <= DENSE_RANGE
+        present = np.zeros(radices[name], dtype=np.int64) if dense else None
+        count, mean, m2 = 0, 0.0, 0.0
+        for start in range(0, len(log), block_rows):
+            block = codes(name, start)
+            if dense:
+                present += np.bincount(block, minlength=radices[name])
+            if name not in log.categories and len(block):
+                # Combine the block's mean and squared deviations with the running ones (Chan et al.).
+                values = block + offsets[name]
+                block_mean = values.mean()
+                block_m2 = ((values - block_mean) ** 2).sum()
+                delta = block_mean - mean
+                total = count + len(values)
+                m2 += block_m2 + delta ** 2 * count * len(values) / total
+                mean += delta * len(values) / total
+                count = total
+        stats = dict.fromkeys(['min', 'max', 'mean', 'std'])
+        if name in log.categories:
+            nulls, dtype = present[0], 'category'
+        else:
+            # Not nullable in the click schema, so every value is present.
+            nulls, dtype = 0, log.meta['dtypes'][name]
+            if count:
+                lo, hi = log.value_range(name)
+                stats = {'min': lo, 'max': hi, 'mean': mean, 'std': np.sqrt(m2 / (count - 1)) if count > 1 else np.nan}
+        cardinality = np.count_nonzero(present[1:]) if dense else len(np.unique(log.column(name)))
+        columns.append(_column_entry(name, dtype, len(log), nulls, cardinality, stats))
+
+    def blocks(subset):
+        for start in range(0, len(log), block_rows):
+            yield [codes(name, start) for name in subset]
+
+    duplicate_rows = _duplicates(blocks(names), [radices[name] for name in names], len(log))
+    duplicate_keys = None
+    if key:
+        duplicate_keys = _duplicates(blocks(key), [radices[name] for name in key], len(log))
+    return _report(len(log), columns, duplicate_rows, key, duplicate_keys)
+
+
+def _report_path(name, cache_dir):
+    return os.path.join(cache_dir, f'{name}.quality.json')
+
+
+def quality_report(name, data_root, cache_dir=None, use_cache=True):
+    """Quality report of OULAD table ``name``, reused from the cache while the csv is unchanged."""
+    path = table_path(name, data_root)
+    cache_dir = cache_dir or os.path.join(data_root, '.cache')
+    report_path = _report_path(name, cache_dir)
+    signature = source_signature(path)
+    if use_cache and os.path.exists(report_path):
+        with open(report_path) as f:
+            cached = json.load(f)
+        if cached.get('quality_version') == QUALITY_VERSION and cached.get('source') == signature:
+            return cached
+
+    if name == 'studentMoodleInteract':
+        # Profiled straight from the memory-mapped click store; no csv parsing, no copy.
+        profile = profile_click_log(open_click_log(data_root, cache_dir), TABLE_KEYS[name])
+    else:
+        profile = profile_frame(load_table(name, data_root, cache_dir, use_cache), TABLE_KEYS.get(name))
+    report = {'table': name, 'quality_version': QUALITY_VERSION, 'source': signature, **profile}
+    if use_cache:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(report_path, 'w') as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+def column_summary(report):
+    """The per-column part of a report as a DataFrame indexed by column name."""
+    return pd.DataFrame(report['columns'], columns=['column', 'dtype'] + STATISTICS).set_index('column')
+
+
+def format_report(report):
+    """A report as printable text (what ``info``/``describe``/``duplicated``/``isnull`` showed)."""
+    lines = [f"{report.get('table', 'table')}: {report['rows']:,} rows, {len(report['columns'])} columns",
+             f"duplicate rows: {report['duplicate_rows']:,}"]
+    if report['key']:
+        lines.append(f"duplicate keys ({', '.join(report['key'])}): {report['duplicate_keys']:,}")
+    with pd.option_context('display.width', 120, 'display.max_columns', None):
+        lines.append(column_summary(report).to_string(float_format=lambda x: f'{x:,.2f}'))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Data-quality profile of the OULAD tables.')
+    parser.add_argument('--data-root', required=True, help='folder containing the OULAD csv files')
+    parser.add_argument('--cache-dir', help='folder for the cached reports (default: <data-root>/.cache)')
+    parser.add_argument('--no-cache', action='store_true', help='always recompute the reports')
+    parser.add_argument('--table', nargs='+', choices=list(FILES), default=list(FILES))
+    args = parser.parse_args(argv)
+    for name in args.table:
+        print(format_report(quality_report(name, args.data_root, args.cache_dir, not args.no_cache)), end='\n\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
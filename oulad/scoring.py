@@ -0,0 +1,167 @@
+"""Scoring of at-risk students on new click data with a persisted model.
+
+``save_model`` writes everything a scoring run needs to one folder: the fitted
+logistic regression, the demographic encoder, the ``id_site -> activity_type`` lookup
+and the activity columns of the training data. ``Scorer`` loads that folder, takes
+``studentMoodleInteract`` rows in chunks (or as a stream of chunks), keeps running
+click totals per enrolment and activity, and returns ``final_result`` probabilities.
+
+Command line:
+``python -m oulad.scoring --model-dir DIR --clicks new_clicks.csv --students studentInfo.csv --output scores.csv``
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import joblib
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from oulad.cleaning import merge_minority_categories
+from oulad.encoding import CategoricalEncoder
+from oulad.joins import UNKNOWN, SiteLookup
+from oulad.loader import CHUNK_SIZE, ENROLMENT_KEY, iter_csv_chunks, read_csv_typed
+from oulad.model import assemble_features
+
+MODEL_FILE = 'model.joblib'
+ENCODER_FILE = 'encoder.json'
+SITES_FILE = 'sites.npz'
+META_FILE = 'meta.json'
+
+
+def save_model(model_dir, model, encoder, lookup, click_activities):
+    """Persist a fitted model with the encoder, site lookup and activity columns it was trained with."""
+    os.makedirs(model_dir, exist_ok=True)
+    joblib.dump(model, os.path.join(model_dir, MODEL_FILE))
+    encoder.save(os.path.join(model_dir, ENCODER_FILE))
+    lookup.save(os.path.join(model_dir, SITES_FILE))
+    meta = {'classes': [str(c) for c in model.classes_], 'activities': [str(a) for a in click_activities]}
+    with open(os.path.join(model_dir, META_FILE), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+
+class Scorer:
+    """Incrementally updated click features plus a persisted model."""
+
+    def __init__(self, model_dir):
+        self.model = joblib.load(os.path.join(model_dir, MODEL_FILE))
+        self.encoder = CategoricalEncoder.load(os.path.join(model_dir, ENCODER_FILE))
+        lookup = SiteLookup.load(os.path.join(model_dir, SITES_FILE))
+        with open(os.path.join(model_dir, META_FILE)) as f:
+            meta = json.load(f)
+        self.classes = meta['classes']
+        self.activities = meta['activities']
+
+        # Translate lookup codes straight into click-matrix columns (-1: not a model feature);
+        # the trailing entry is what UNKNOWN (-1) codes index.
+        column_of = {activity: i for i, activity in enumerate(self.activities)}
+        to_column = np.array([column_of.get(str(c), -1) for c in lookup.categories] + [UNKNOWN], dtype=np.int16)
+        self._site_column = to_column[lookup.table]
+
+        self._rows = {}
+        self._clicks = np.zeros((0, len(self.activities)))
+
+    @property
+    def enrolments(self):
+        """Enrolment key of every row of the click state, in row order."""
+        return pd.DataFrame(list(self._rows), columns=ENROLMENT_KEY)
+
+    def _row_ids(self, keys):
+        """State row of each enrolment in ``keys`` (a DataFrame of distinct keys), adding new ones."""
+        rows = np.empty(len(keys), dtype=np.int64)
+        for i, key in enumerate(keys.itertuples(index=False, name=None)):
+            row = self._rows.get(key)
+            if row is None:
+                row = self._rows[key] = len(self._rows)
+            rows[i] = row
+        if len(self._rows) > len(self._clicks):
+            grown = np.zeros((max(len(self._rows), 2 * len(self._clicks)), len(self.activities)))
+            grown[:len(self._clicks)] = self._clicks
+            self._clicks = grown
+        return rows
+
+    def update(self, clicks):
+        """Add a chunk of click rows (``studentMoodleInteract`` columns) to the running totals."""
+        site = clicks['id_site'].to_numpy()
+        known = (site >= 0) & (site < len(self._site_column))
+        column = np.full(len(site), -1, dtype=np.int16)
+        column[known] = self._site_column[site[known]]
+        keep = column >= 0
+        if not keep.any():
+            return self
+
+        grouped = clicks.loc[keep, ENROLMENT_KEY].astype(
+            {'code_module': str, 'code_presentation': str}).groupby(ENROLMENT_KEY, sort=False)
+        codes = grouped.ngroup().to_numpy()
+        rows = self._row_ids(grouped.size().index.to_frame(index=False))
+
+        n_activities = len(self.activities)
+        flat = rows[codes] * n_activities + column[keep]
+        cells, inverse = np.unique(flat, return_inverse=True)
+        totals = np.bincount(inverse, weights=clicks['sum_click'].to_numpy()[keep].astype(np.float64))
+        self._clicks.reshape(-1)[cells] += totals
+        return self
+
+    def click_features(self, enrolments):
+        """Sparse click matrix rows for ``enrolments`` (zeros for enrolments without clicks)."""
+        rows = [self._rows.get((str(m), str(p), s), -1) for m, p, s in
+                enrolments[ENROLMENT_KEY].itertuples(index=False, name=None)]
+        rows = np.asarray(rows, dtype=np.int64)
+        dense = np.zeros((len(rows), len(self.activities)))
+        dense[rows >= 0] = self._clicks[rows[rows >= 0]]
+        return sparse.csr_matrix(dense)
+
+    def score(self, student_info):
+        """``final_result`` probabilities for the enrolments of ``student_info``.
+
+        ``student_info`` has the columns of ``studentInfo.csv`` as read from the file; the
+        minority education/age categories are merged here as they were for training
+        (already cleaned frames work too). Rows are not dropped: every enrolment is
+        scored, and missing demographics encode as zeros.
+
+        Returns the enrolment key columns and one ``p_<class>`` column per class.
+        """
+        student_info = merge_minority_categories(student_info)
+        X = assemble_features(student_info, self.encoder, self.click_features(student_info))
+        proba = self.model.predict_proba(X)
+        result = student_info[ENROLMENT_KEY].reset_index(drop=True)
+        for k, label in enumerate(self.model.classes_):
+            result[f'p_{label}'] = proba[:, k]
+        return result
+
+    def score_stream(self, chunks, student_info, every=1):
+        """Consume an iterable of click chunks, yielding fresh scores every ``every`` chunks."""
+        pending = 0
+        for chunk in chunks:
+            self.update(chunk)
+            pending += 1
+            if pending == every:
+                pending = 0
+                yield self.score(student_info)
+        if pending:
+            yield self.score(student_info)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Score enrolments on new click data with a saved model.')
+    parser.add_argument('--model-dir', required=True, help='folder written by save_model')
+    parser.add_argument('--clicks', nargs='+', required=True, help='studentMoodleInteract csv file(s), in order')
+    parser.add_argument('--students', required=True, help='studentInfo csv of the enrolments to score')
+    parser.add_argument('--output', required=True, help='csv file for the probabilities')
+    parser.add_argument('--chunksize', type=int, default=CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    students = read_csv_typed(args.students, 'studentInfo')
+    scorer = Scorer(args.model_dir)
+    for path in args.clicks:
+        for chunk in iter_csv_chunks(path, 'studentMoodleInteract', args.chunksize):
+            scorer.update(chunk)
+    scorer.score(students).to_csv(args.output, index=False)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
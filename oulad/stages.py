@@ -0,0 +1,186 @@
+"""Named pipeline stages with a content-addressed, size-bounded output cache.
+
+A ``StageGraph`` holds named stages, each a function of the outputs of its declared
+input stages (``'stage'``, or ``'stage.item'`` for one item of a dict output) and of
+fixed parameters. The key of a stage is a SHA-1 over its name, the source code of the
+module defining its function and of the functions or modules it declares in ``code``,
+its parameters, the signature (size, mtime) of the files it reads and the keys of its
+inputs; any edit upstream of a stage therefore changes its key. All keys are known
+before anything runs, and ``StageGraph.run`` evaluates on demand: a stage found in the
+cache is read back without touching its inputs, so after an edit only the stages
+downstream of it are recomputed.
+
+``StageCache`` keeps one joblib file per key in a folder and evicts the least recently
+used entries once their total size exceeds ``max_bytes``.
+"""
+
+import functools
+import hashlib
+import inspect
+import json
+import os
+
+import joblib
+
+from oulad.loader import source_signature
+from oulad.profiling import StageProfiler
+
+DEFAULT_MAX_BYTES = 2 * 2 ** 30
+SUFFIX = '.joblib'
+
+
+def _unwrap(obj):
+    return obj.func if isinstance(obj, functools.partial) else obj
+
+
+def _source(obj):
+    return inspect.getsource(_unwrap(obj))
+
+
+class StageCache:
+    """Stage outputs by key in ``cache_dir``, at most ``max_bytes`` in total (LRU eviction)."""
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + SUFFIX)
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+    def get(self, key):
+        """The cached value of ``key``; marks it as most recently used."""
+        path = self._path(key)
+        value = joblib.load(path)
+        os.utime(path)
+        return value
+
+    def put(self, key, value):
+        """Store ``value`` under ``key`` and evict old entries to stay within ``max_bytes``."""
+        path = self._path(key)
+        # Write under a temporary name so an interrupted run never leaves a truncated entry.
+        joblib.dump(value, path + '.tmp')
+        os.replace(path + '.tmp', path)
+        self.evict(keep=key)
+
+    def entries(self):
+        """(last use in ns, size in bytes, path) of every entry, least recently used first."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(SUFFIX):
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((stat.st_mtime_ns, stat.st_size, os.path.join(self.cache_dir, name)))
+        return sorted(entries)
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, keep=None):
+        """Remove least recently used entries (never ``keep``) until the total fits ``max_bytes``."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        kept = self._path(keep) if keep else None
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path != kept:
+                os.remove(path)
+                total -= size
+
+
+class StageSpec:
+    """One stage: ``func(*<input outputs>, **params)``; see ``StageGraph.add``."""
+
+    def __init__(self, name, func, inputs, params, files, code, cache):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.params = dict(params or {})
+        self.files = list(files)
+        # The whole defining module, so module-level constants and helpers are hashed too.
+        self.code = [func, inspect.getmodule(_unwrap(func))]
+        self.code += [obj for obj in code if obj not in self.code]
+        self.cache = cache
+
+    def key(self, input_keys):
+        digest = hashlib.sha1()
+        digest.update(json.dumps({
+            'name': self.name,
+            'code': [hashlib.sha1(_source(obj).encode()).hexdigest() for obj in self.code],
+            'params': {name: repr(value) for name, value in sorted(self.params.items())},
+            'files': [[path, source_signature(path)] for path in self.files],
+            'inputs': input_keys,
+        }, sort_keys=True).encode())
+        return digest.hexdigest()
+
+
+class StageGraph:
+    """Stages in dependency order, evaluated on demand through an optional ``StageCache``."""
+
+    def __init__(self):
+        self.stages = {}
+
+    def add(self, name, func, inputs=(), params=None, files=(), code=(), cache=True):
+        """Add stage ``name`` computing ``func(*[outputs of inputs], **params)``.
+
+        Arguments bound to ``func`` with ``functools.partial`` are settings that do not
+        change the result (paths, cache folders, worker counts) and are not hashed;
+        ``params`` are. ``files`` are read by the stage. The module defining ``func``
+        is always hashed; ``code`` lists further functions or modules (e.g. those of
+        the helpers ``func`` calls) whose source the result depends on. Stages with
+        ``cache=False`` (cheap lookups, side effects) always run.
+        """
+        if name in self.stages:
+            raise ValueError(f"Stage {name!r} is already defined")
+        missing = [stage for stage in inputs if stage.partition('.')[0] not in self.stages]
+        if missing:
+            raise ValueError(f"Stage {name!r} needs undefined stages {missing}; add them first")
+        self.stages[name] = StageSpec(name, func, inputs, params, files, code, cache)
+        return self
+
+    def keys(self):
+        """The cache key of every stage."""
+        keys = {}
+        for name, spec in self.stages.items():
+            input_keys = []
+            for stage in spec.inputs:
+                upstream, _, item = stage.partition('.')
+                input_keys.append(f'{keys[upstream]}.{item}' if item else keys[upstream])
+            keys[name] = spec.key(input_keys)
+        return keys
+
+    def run(self, targets=None, cache=None, profiler=None):
+        """Outputs of ``targets`` (default: every stage), keyed by stage name.
+
+        Every stage that is computed or read from ``cache`` is recorded as a stage of
+        ``profiler``; the records of cache hits have ``cached`` set.
+        """
+        profiler = profiler or StageProfiler()
+        keys = self.keys()
+        values = {}
+
+        def evaluate(name):
+            stage, _, item = name.partition('.')
+            if item:
+                return evaluate(stage)[item]
+            if name in values:
+                return values[name]
+            spec = self.stages[name]
+            key = keys[name]
+            if cache is not None and spec.cache and key in cache:
+                with profiler.stage(name) as s:
+                    s.cached = True
+                    values[name] = s.output(cache.get(key))
+                return values[name]
+            inputs = [evaluate(stage) for stage in spec.inputs]
+            with profiler.stage(name, inputs) as s:
+                values[name] = s.output(spec.func(*inputs, **spec.params))
+            if cache is not None and spec.cache:
+                cache.put(key, values[name])
+            return values[name]
+
+        targets = list(self.stages) if targets is None else targets
+        return {name: evaluate(name) for name in targets}
@@ -0,0 +1,106 @@
+"""Vectorized statistical tests used in the click analysis."""
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+RESULT_CLASSES = ['Distinction', 'Pass', 'Fail', 'Withdrawn']
+
+METHODS = ('anova', 'welch', 'kruskal')
+
+
+def _group_moments(df, group, by, value, levels):
+    """Count, mean and variance per (group, level) as group x level arrays."""
+    moments = df.groupby([group, by], observed=True)[value].agg(['count', 'mean', 'var']).unstack(by)
+    n = moments['count'].reindex(columns=levels).fillna(0).to_numpy(dtype=float)
+    mean = moments['mean'].reindex(columns=levels).to_numpy(dtype=float)
+    var = moments['var'].reindex(columns=levels).to_numpy(dtype=float)
+    return moments.index, n, mean, var
+
+
+def _anova(n, mean, var):
+    k = (n > 0).sum(axis=1)
+    total = n.sum(axis=1)
+    grand_mean = np.nansum(n * mean, axis=1) / total
+    ss_between = np.nansum(n * (mean - grand_mean[:, None]) ** 2, axis=1)
+    ss_within = np.nansum(np.where(n > 1, (n - 1) * var, 0.0), axis=1)
+    df_between = k - 1
+    df_within = total - k
+    with np.errstate(divide='ignore', invalid='ignore'):
+        statistic = (ss_between / df_between) / (ss_within / df_within)
+    p_value = stats.f.sf(statistic, df_between, df_within)
+    return statistic, p_value, df_between, df_within
+
+
+def _welch(n, mean, var):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        valid = n > 1
+        k = valid.sum(axis=1)
+        weight = np.where(valid, n / var, 0.0)
+        total_weight = weight.sum(axis=1)
+        weighted_mean = np.nansum(np.where(valid, weight * mean, 0.0), axis=1) / total_weight
+        between = np.nansum(np.where(valid, weight * (mean - weighted_mean[:, None]) ** 2, 0.0), axis=1) / (k - 1)
+        tmp = np.nansum(np.where(valid, (1 - weight / total_weight[:, None]) ** 2 / (n - 1), 0.0), axis=1)
+        statistic = between / (1 + 2 * (k - 2) * tmp / (k ** 2 - 1))
+        df_between = (k - 1).astype(float)
+        df_within = (k ** 2 - 1) / (3 * tmp)
+    p_value = stats.f.sf(statistic, df_between, df_within)
+    return statistic, p_value, df_between, df_within
+
+
+def _kruskal(df, group, by, value, groups, levels):
+    ranks = df.groupby(group, observed=True)[value].rank()
+    rank_sums = ranks.groupby([df[group], df[by]], observed=True).agg(['count', 'sum']).unstack(by)
+    rank_sums = rank_sums.reindex(index=groups)
+    n = rank_sums['count'].reindex(columns=levels).fillna(0).to_numpy(dtype=float)
+    r = rank_sums['sum'].reindex(columns=levels).fillna(0).to_numpy(dtype=float)
+    total = n.sum(axis=1)
+    k = (n > 0).sum(axis=1)
+
+    # Tie correction: sum of (t^3 - t) over runs of equal values within each group.
+    ties = df.groupby([group, value], observed=True).size().astype(float)
+    tie_term = (ties ** 3 - ties).groupby(level=0, observed=True).sum().reindex(groups).to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        h = 12.0 / (total * (total + 1)) * np.where(n > 0, r ** 2 / n, 0.0).sum(axis=1) - 3 * (total + 1)
+        h /= 1 - tie_term / (total ** 3 - total)
+    df_between = (k - 1).astype(float)
+    p_value = stats.chi2.sf(h, df_between)
+    return h, p_value, df_between, np.full(len(h), np.nan)
+
+
+def grouped_anova(df, group='activity_type', by='final_result', value='sum_click', levels=None, method='anova'):
+    """One-way test of ``value`` across the ``by`` levels, separately for every ``group``.
+
+    All groups are tested at once from a single groupby of per-(group, level) moments
+    instead of slicing the frame once per group. ``method`` is ``'anova'`` (classic
+    F test, as ``scipy.stats.f_oneway``), ``'welch'`` (unequal variances) or
+    ``'kruskal'`` (Kruskal-Wallis H test on ranks). ``levels`` restricts the compared
+    levels (default: every level present, e.g. all four ``final_result`` classes).
+
+    Returns a DataFrame indexed by ``group`` with ``statistic``, ``p_value``,
+    ``df_between``, ``df_within`` and the number of observations per level.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown method {method!r}; expected one of {METHODS}")
+    df = df[[group, by, value]].dropna()
+    if levels is not None:
+        df = df[df[by].isin(levels)]
+    levels = list(levels) if levels is not None else sorted(df[by].unique())
+    df = df.assign(**{by: pd.Categorical(df[by], categories=levels)})
+
+    groups, n, mean, var = _group_moments(df, group, by, value, levels)
+    if method == 'anova':
+        statistic, p_value, df_between, df_within = _anova(n, mean, var)
+    elif method == 'welch':
+        statistic, p_value, df_between, df_within = _welch(n, mean, var)
+    else:
+        statistic, p_value, df_between, df_within = _kruskal(df, group, by, value, groups, levels)
+
+    result = pd.DataFrame({
+        'statistic': statistic,
+        'p_value': p_value,
+        'df_between': df_between,
+        'df_within': df_within,
+    }, index=groups)
+    counts = pd.DataFrame(n.astype(np.int64), index=groups, columns=[f'n_{level}' for level in levels])
+    return result.join(counts)
@@ -0,0 +1,216 @@
+"""Synthetic OULAD-shaped data for benchmarks and for sharing the pipeline without student data.
+
+``generate_tables`` builds ``courses``, ``studentInfo``, ``studentRegistration`` and
+``moodle`` with the real schemas, category vocabularies and proportions (7 modules,
+22 presentations, 20 activity types, ~6.4k sites); ``iter_clicks`` then draws
+``studentMoodleInteract`` rows chunk by chunk, so even 100x the real click volume is
+written without holding it in memory. ``scale`` multiplies the number of enrolments and
+of click rows (1.0: ~32.6k enrolments and ~10.7M clicks, as in the real data).
+
+Clicks are skewed like the real log: per-enrolment activity is log-normal and depends on
+the final result, site popularity within a presentation is Zipf-like, ``sum_click`` is
+Zipf distributed, and withdrawn students stop clicking when they unregister.
+
+Command line:
+``python -m oulad.synthetic --output-dir DIR [--scale 10] [--seed 0]``
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from oulad.loader import CHUNK_SIZE, FILES
+
+PRESENTATIONS = {
+    'AAA': ['2013J', '2014J'],
+    'BBB': ['2013B', '2013J', '2014B', '2014J'],
+    'CCC': ['2014B', '2014J'],
+    'DDD': ['2013B', '2013J', '2014B', '2014J'],
+    'EEE': ['2013J', '2014B', '2014J'],
+    'FFF': ['2013B', '2013J', '2014B', '2014J'],
+    'GGG': ['2013J', '2014B', '2014J'],
+}
+
+# Approximate number of moodle sites per activity type in the real data.
+ACTIVITY_SITES = {
+    'resource': 2660, 'subpage': 1055, 'oucontent': 996, 'url': 886, 'forumng': 194, 'quiz': 127,
+    'page': 102, 'oucollaborate': 82, 'questionnaire': 61, 'ouwiki': 49, 'dataplus': 28,
+    'externalquiz': 26, 'homepage': 22, 'ouelluminate': 21, 'glossary': 21, 'dualpane': 20,
+    'repeatactivity': 5, 'htmlactivity': 3, 'sharedsubpage': 3, 'folder': 2,
+}
+
+# Demographic vocabularies with their approximate shares.
+GENDER = {'M': 0.55, 'F': 0.45}
+REGION = {
+    'Scotland': 0.108, 'East Anglian Region': 0.102, 'London Region': 0.099, 'South Region': 0.095,
+    'North Western Region': 0.087, 'West Midlands Region': 0.079, 'South West Region': 0.075,
+    'East Midlands Region': 0.072, 'South East Region': 0.066, 'Wales': 0.064, 'Yorkshire Region': 0.063,
+    'North Region': 0.056, 'Ireland': 0.034,
+}
+HIGHEST_EDUCATION = {
+    'A Level or Equivalent': 0.431, 'Lower Than A Level': 0.404, 'HE Qualification': 0.145,
+    'No Formal quals': 0.011, 'Post Graduate Qualification': 0.009,
+}
+IMD_BAND = {
+    '0-10%': 0.099, '10-20': 0.102, '20-30%': 0.112, '30-40%': 0.107, '40-50%': 0.101, '50-60%': 0.095,
+    '60-70%': 0.089, '70-80%': 0.090, '80-90%': 0.089, '90-100%': 0.082, None: 0.034,
+}
+AGE_BAND = {'0-35': 0.704, '35-55': 0.289, '55<=': 0.007}
+DISABILITY = {'N': 0.903, 'Y': 0.097}
+FINAL_RESULT = {'Pass': 0.379, 'Withdrawn': 0.312, 'Fail': 0.216, 'Distinction': 0.093}
+# Relative click activity of an enrolment by final result.
+RESULT_ACTIVITY = {'Distinction': 1.8, 'Pass': 1.4, 'Fail': 0.6, 'Withdrawn': 0.35}
+
+ENROLMENTS = 32_593
+STUDENTS_PER_ENROLMENT = 0.883
+CLICKS = 10_655_280
+FIRST_CLICK_DAY = -25
+MAX_SUM_CLICK = 6977
+
+
+def _choice(rng, shares, n):
+    values = list(shares)
+    p = np.array(list(shares.values()))
+    return np.array(values, dtype=object)[rng.choice(len(values), n, p=p / p.sum())]
+
+
+def generate_tables(scale=1.0, seed=0):
+    """The four small tables (everything but the click log) as DataFrames."""
+    rng = np.random.default_rng(seed)
+    presentations = [(m, p) for m, ps in PRESENTATIONS.items() for p in ps]
+    courses = pd.DataFrame(presentations, columns=['code_module', 'code_presentation'])
+    courses['module_presentation_length'] = rng.integers(234, 270, len(courses))
+
+    # Students may be enrolled on several presentations; draw enrolments and drop repeats.
+    n = max(int(round(ENROLMENTS * scale)), len(courses))
+    students = rng.choice(np.arange(6_000, 6_000 + max(3_000_000, 4 * n)), int(n * STUDENTS_PER_ENROLMENT) + 1,
+                          replace=False)
+    enrolments = pd.DataFrame({
+        'presentation': rng.integers(0, len(courses), n),
+        'id_student': students[rng.integers(0, len(students), n)],
+    }).drop_duplicates().sort_values(['presentation', 'id_student'], ignore_index=True)
+    n = len(enrolments)
+    info = pd.DataFrame({
+        'code_module': courses['code_module'].to_numpy()[enrolments['presentation']],
+        'code_presentation': courses['code_presentation'].to_numpy()[enrolments['presentation']],
+        'id_student': enrolments['id_student'].to_numpy(),
+        'gender': _choice(rng, GENDER, n),
+        'region': _choice(rng, REGION, n),
+        'highest_education': _choice(rng, HIGHEST_EDUCATION, n),
+        'imd_band': _choice(rng, IMD_BAND, n),
+        'age_band': _choice(rng, AGE_BAND, n),
+        'num_of_prev_attempts': np.minimum(rng.geometric(0.85, n) - 1, 6),
+        'studied_credits': 30 * np.minimum(rng.geometric(0.45, n), 21) + 30 * (rng.random(n) < 0.1),
+        'disability': _choice(rng, DISABILITY, n),
+        'final_result': _choice(rng, FINAL_RESULT, n),
+    })
+
+    length = courses['module_presentation_length'].to_numpy()[enrolments['presentation']]
+    withdrawn = info['final_result'].to_numpy() == 'Withdrawn'
+    # Nearly every withdrawn student has an unregistration date; a few others do too,
+    # which is the conflict the notebook reconciles.
+    unregistered = np.where(withdrawn, rng.random(n) < 0.98, rng.random(n) < 0.005)
+    registration = info[['code_module', 'code_presentation', 'id_student']].copy()
+    registration['date_registration'] = pd.array(
+        np.clip(rng.normal(-70, 50, n), -322, 167).round(), dtype='Int16')
+    registration.loc[rng.random(n) < 0.0014, 'date_registration'] = pd.NA
+    registration['date_unregistration'] = pd.array(
+        np.where(unregistered, rng.integers(-120, length), np.nan), dtype='Int16')
+
+    n_sites = sum(ACTIVITY_SITES.values())
+    site_presentation = np.sort(rng.integers(0, len(courses), n_sites))
+    activity = _choice(rng, ACTIVITY_SITES, n_sites)
+    has_week = rng.random(n_sites) < 0.18
+    week_from = rng.integers(0, 30, n_sites)
+    moodle = pd.DataFrame({
+        'id_site': np.sort(rng.choice(np.arange(526_000, 1_078_000), n_sites, replace=False)),
+        'code_module': courses['code_module'].to_numpy()[site_presentation],
+        'code_presentation': courses['code_presentation'].to_numpy()[site_presentation],
+        'activity_type': activity,
+        'week_from': pd.array(np.where(has_week, week_from, np.nan), dtype='Int8'),
+        'week_to': pd.array(np.where(has_week, week_from + rng.integers(0, 2, n_sites), np.nan), dtype='Int8'),
+    })
+    return {'courses': courses, 'studentInfo': info, 'studentRegistration': registration, 'moodle': moodle}
+
+
+def iter_clicks(tables, scale=1.0, seed=0, chunk_rows=CHUNK_SIZE):
+    """Yield ``studentMoodleInteract`` chunks of up to ``chunk_rows`` rows for ``tables``."""
+    rng = np.random.default_rng([seed, 1])
+    courses, info, registration, moodle = (
+        tables['courses'], tables['studentInfo'], tables['studentRegistration'], tables['moodle'])
+    key = ['code_module', 'code_presentation']
+    presentation = pd.MultiIndex.from_frame(courses[key].astype(str))
+    enrolment_presentation = presentation.get_indexer(pd.MultiIndex.from_frame(info[key].astype(str)))
+    site_presentation = presentation.get_indexer(pd.MultiIndex.from_frame(moodle[key].astype(str)))
+
+    # Click window of every enrolment: from day FIRST_CLICK_DAY to the end of the
+    # presentation or the day before unregistering.
+    length = courses['module_presentation_length'].to_numpy()[enrolment_presentation]
+    unregistration = registration['date_unregistration'].to_numpy(dtype=np.float64, na_value=np.inf)
+    last_day = np.minimum(length, unregistration - 1).astype(np.int64)
+
+    # Enrolments are drawn in proportion to a log-normal activity level.
+    weight = rng.lognormal(0.0, 1.0, len(info)) * info['final_result'].map(RESULT_ACTIVITY).to_numpy()
+    weight[last_day < FIRST_CLICK_DAY] = 0
+    enrolment_cdf = np.cumsum(weight)
+    enrolment_cdf /= enrolment_cdf[-1]
+
+    # Zipf-like site popularity within each presentation (homepages are the most visited).
+    # The sites are sorted by presentation, so adding the presentation number to each
+    # block's cumulative popularity turns one searchsorted into a per-presentation draw.
+    order = np.argsort(site_presentation, kind='stable')
+    sites = moodle['id_site'].to_numpy()[order]
+    site_presentation = site_presentation[order]
+    rank = rng.permutation(len(sites)) % 300 + 1
+    popularity = rank ** -0.8 * np.where(moodle['activity_type'].to_numpy()[order] == 'homepage', 20.0, 1.0)
+    cumulative = pd.Series(popularity).groupby(site_presentation).cumsum()
+    site_cdf = site_presentation + (cumulative / cumulative.groupby(site_presentation).transform('max')).to_numpy()
+
+    total = int(round(CLICKS * scale))
+    for start in range(0, total, chunk_rows):
+        rows = min(chunk_rows, total - start)
+        enrolment = np.minimum(np.searchsorted(enrolment_cdf, rng.random(rows)), len(info) - 1)
+        p = enrolment_presentation[enrolment]
+        site = np.minimum(np.searchsorted(site_cdf, p + rng.random(rows)), len(sites) - 1)
+        span = last_day[enrolment] - FIRST_CLICK_DAY + 1
+        yield pd.DataFrame({
+            'code_module': info['code_module'].to_numpy()[enrolment],
+            'code_presentation': info['code_presentation'].to_numpy()[enrolment],
+            'id_student': info['id_student'].to_numpy()[enrolment],
+            'id_site': sites[site],
+            'date': FIRST_CLICK_DAY + (rng.random(rows) * span).astype(np.int64),
+            'sum_click': np.minimum(rng.zipf(2.2, rows), MAX_SUM_CLICK),
+        })
+
+
+def write_dataset(output_dir, scale=1.0, seed=0, chunk_rows=CHUNK_SIZE):
+    """Write all five tables as OULAD csv files to ``output_dir``; returns the paths."""
+    os.makedirs(output_dir, exist_ok=True)
+    tables = generate_tables(scale, seed)
+    paths = []
+    for name, df in tables.items():
+        paths.append(os.path.join(output_dir, FILES[name]))
+        df.to_csv(paths[-1], index=False)
+    paths.append(os.path.join(output_dir, FILES['studentMoodleInteract']))
+    for i, chunk in enumerate(iter_clicks(tables, scale, seed, chunk_rows)):
+        chunk.to_csv(paths[-1], mode='w' if i == 0 else 'a', header=i == 0, index=False)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Write a synthetic OULAD-shaped dataset.')
+    parser.add_argument('--output-dir', required=True)
+    parser.add_argument('--scale', type=float, default=1.0, help='multiple of the real enrolment and click volume')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunksize', type=int, default=CHUNK_SIZE, help='click rows generated per chunk')
+    args = parser.parse_args(argv)
+    for path in write_dataset(args.output_dir, args.scale, args.seed, args.chunksize):
+        print(path)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""Time-windowed click features of every enrolment as of a cutoff day.
+
+The click log is reduced once to daily totals per enrolment, sorted by enrolment and
+``date``. Every window query is then two ``np.searchsorted`` calls over a packed
+``(enrolment, date)`` key plus a difference of one global cumulative sum, so all
+windows for all enrolments cost a few vectorized passes instead of a groupby per window.
+Only clicks on or before the cutoff day are used, so a model can be trained per cutoff
+without looking ahead. Given the enrolments (e.g. the rows of studentInfo), the features
+cover every one of them, and enrolments without clicks get zero activity.
+"""
+
+import numpy as np
+
+from oulad.aggregate import PIVOT_KEY
+from oulad.clicklog import ClickLog, grouped_sum
+from oulad.joins import merge_checked
+
+CUMULATIVE_DAYS = (0, 30, 60, 90)
+ROLLING_DAYS = (7, 14)
+
+
+class DailyClicks:
+    """Clicks per enrolment and day, with the cumulative sums the window queries need.
+
+    ``enrolments`` optionally holds the enrolments (``PIVOT_KEY`` columns, one row each)
+    the features are returned for, in its order; by default they cover the enrolments
+    with at least one click.
+    """
+
+    def __init__(self, daily, enrolments=None):
+        # ``daily`` is sorted by PIVOT_KEY then date (as a groupby or grouped_sum returns it).
+        grouped = daily.groupby(PIVOT_KEY, observed=True, sort=False)
+        self.enrolments = grouped.size().index.to_frame(index=False)
+        self.group = grouped.ngroup().to_numpy(dtype=np.int64)
+        self.date = daily['date'].to_numpy(dtype=np.int64)
+        self.first_day = int(self.date.min()) if len(self.date) else 0
+        self._span = (int(self.date.max()) - self.first_day + 2) if len(self.date) else 1
+        self._key = self.group * self._span + (self.date - self.first_day)
+        if np.any(np.diff(self._key) < 0):
+            raise ValueError("Daily clicks must be sorted by enrolment and date")
+        self._cumsum = np.concatenate([[0], np.cumsum(daily['sum_click'].to_numpy(dtype=np.int64))])
+        self._starts = np.searchsorted(self._key, np.arange(len(self.enrolments)) * self._span)
+        self.index = None if enrolments is None else enrolments[PIVOT_KEY].reset_index(drop=True)
+
+    @classmethod
+    def from_clicks(cls, clicks, enrolments=None):
+        """Reduce a ``ClickLog`` or a click DataFrame to daily totals per enrolment."""
+        if isinstance(clicks, ClickLog):
+            daily = grouped_sum(clicks, PIVOT_KEY + ['date'])
+        else:
+            daily = clicks.groupby(PIVOT_KEY + ['date'], observed=True)['sum_click'].sum().reset_index()
+        return cls(daily, enrolments)
+
+    def __len__(self):
+        return len(self.enrolments if self.index is None else self.index)
+
+    def _position(self, day):
+        """Index just past each enrolment's last daily row with ``date <= day``."""
+        offset = np.clip(day - self.first_day, -1, self._span - 1)
+        return np.searchsorted(self._key, np.arange(len(self.enrolments)) * self._span + offset, side='right')
+
+    def window(self, first, last):
+        """Clicks and active days per enrolment for days ``first`` to ``last`` inclusive."""
+        lo = np.maximum(self._position(first - 1), self._starts)
+        hi = np.maximum(self._position(last), self._starts)
+        return self._cumsum[hi] - self._cumsum[lo], hi - lo
+
+    def features(self, cutoff, cumulative_days=CUMULATIVE_DAYS, rolling_days=ROLLING_DAYS):
+        """Click features of every enrolment using only clicks up to day ``cutoff``.
+
+        * ``clicks_to_day_<d>``: cumulative clicks up to day ``d``, for each ``d`` in
+          ``cumulative_days`` not after the cutoff, and ``clicks_to_cutoff``,
+        * ``clicks_last_<w>d`` and ``active_days_last_<w>d``: clicks and days with clicks
+          in the ``w`` days ending on the cutoff, for each ``w`` in ``rolling_days``,
+        * ``days_since_last_click``: days from the last click to the cutoff (NaN if the
+          enrolment has no click yet).
+
+        With ``enrolments``, enrolments without clicks get 0 clicks and active days.
+        """
+        features = self.enrolments.copy()
+        start = self.first_day
+        for day in cumulative_days:
+            if day <= cutoff:
+                features[f'clicks_to_day_{day}'] = self.window(start, day)[0]
+        features['clicks_to_cutoff'] = self.window(start, cutoff)[0]
+        for width in rolling_days:
+            clicks, active = self.window(cutoff - width + 1, cutoff)
+            features[f'clicks_last_{width}d'] = clicks
+            features[f'active_days_last_{width}d'] = active
+
+        last = np.maximum(self._position(cutoff), self._starts)
+        clicked = last > self._starts
+        since = np.full(len(last), np.nan)
+        since[clicked] = cutoff - self.date[last[clicked] - 1]
+        features['days_since_last_click'] = since
+        if self.index is None:
+            return features
+
+        features = merge_checked(self.index, features, on=PIVOT_KEY, how='left', validate='one_to_one',
+                                 name=f'enrolments x clicks to day {cutoff}')
+        counts = features.columns.difference(PIVOT_KEY + ['days_since_last_click'])
+        features[counts] = features[counts].fillna(0).astype(np.int64)
+        return features
+
+    def features_by_cutoff(self, cutoffs, **kwargs):
+        """``features`` for several cutoff days, as a dict keyed by cutoff."""
+        return {cutoff: self.features(cutoff, **kwargs) for cutoff in cutoffs}
@@ -0,0 +1,47 @@
+import pandas as pd
+
+from oulad.clicklog import build_click_store, grouped_sum
+from oulad.loader import load_table, table_path
+
+CLICKS = """code_module,code_presentation,id_student,id_site,date,sum_click
+AAA,2013J,1,10,-5,2
+BBB,,2,11,0,1
+,2014J,3,12,3,4
+AAA,2014J,1,10,1,1
+CCC,2013J,2,11,2,7
+BBB,,4,12,2,3
+"""
+
+
+def _write_clicks(tmp_path):
+    path = tmp_path / 'studentMoodleInteract.csv'
+    path.write_text(CLICKS)
+    return table_path('studentMoodleInteract', str(tmp_path))
+
+
+def test_store_keeps_missing_categories(tmp_path):
+    # Chunks of two rows give each chunk its own category dictionary.
+    log = build_click_store(_write_clicks(tmp_path), str(tmp_path / 'store'), chunksize=2)
+    expected = load_table('studentMoodleInteract', str(tmp_path), use_cache=False)
+    assert expected[['code_module', 'code_presentation']].isna().sum().tolist() == [1, 2]
+    pd.testing.assert_frame_equal(log.to_frame(), expected)
+    assert list(log.rows_where(code_module='BBB')) == [1, 5]
+
+
+def test_grouped_sum_missing_categories(tmp_path):
+    log = build_click_store(_write_clicks(tmp_path), str(tmp_path / 'store'), chunksize=2)
+    clicks = load_table('studentMoodleInteract', str(tmp_path), use_cache=False)
+    by = ['code_module', 'code_presentation']
+    for dropna in [True, False]:
+        expected = (clicks.groupby(by, observed=True, dropna=dropna)['sum_click']
+                    .agg(['sum', 'count']).reset_index().rename(columns={'sum': 'sum_click'}))
+        expected['sum_click'] = expected['sum_click'].astype('int64')
+        pd.testing.assert_frame_equal(grouped_sum(log, by, dropna=dropna), expected)
+
+
+def test_group_rows_matches_rows_where(tmp_path):
+    log = build_click_store(_write_clicks(tmp_path), str(tmp_path / 'store'), chunksize=2)
+    groups = log.group_rows(['code_module', 'code_presentation'], block_rows=4)
+    assert sorted(groups) == [('AAA', '2013J'), ('AAA', '2014J'), ('CCC', '2013J')]
+    for (module, presentation), rows in groups.items():
+        assert list(rows) == list(log.rows_where(code_module=module, code_presentation=presentation))
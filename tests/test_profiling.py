@@ -0,0 +1,12 @@
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LogisticRegression
+
+from oulad.profiling import count_rows
+
+
+def test_count_rows_counts_only_tables():
+    frame = pd.DataFrame({'a': range(3)})
+    assert count_rows({'x': frame, 'y': np.zeros((2, 4))}) == 5
+    assert count_rows((LogisticRegression(), frame, pd.Index(['quiz', 'url']), ['a'])) == 3
+    assert count_rows((LogisticRegression(), pd.Index(['quiz']), ['a'])) is None
@@ -0,0 +1,19 @@
+import pytest
+
+from oulad.clicklog import build_click_store
+from oulad.loader import load_table, table_path
+from oulad.quality import TABLE_KEYS, profile_click_log, profile_frame
+from tests.test_clicklog import CLICKS
+
+
+def test_click_log_profile_matches_frame(tmp_path):
+    (tmp_path / 'studentMoodleInteract.csv').write_text(CLICKS + CLICKS.split('\n', 1)[1])
+    log = build_click_store(table_path('studentMoodleInteract', str(tmp_path)), str(tmp_path / 'store'), chunksize=3)
+    key = TABLE_KEYS['studentMoodleInteract']
+    expected = profile_frame(load_table('studentMoodleInteract', str(tmp_path), use_cache=False), key)
+    report = profile_click_log(log, key, block_rows=4)
+    assert [column['nulls'] for column in report['columns']] == [2, 4, 0, 0, 0, 0]
+    assert report['duplicate_rows'] == 6
+    for column, expected_column in zip(report.pop('columns'), expected.pop('columns')):
+        assert column == pytest.approx(expected_column, nan_ok=True)
+    assert report == expected
@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+
+from oulad.windows import DailyClicks
+
+
+def test_enrolment_without_clicks_gets_zero_row():
+    clicks = pd.DataFrame({
+        'id_student': np.array([1, 1, 2], dtype='int32'),
+        'code_module': pd.Categorical(['AAA', 'AAA', 'AAA']),
+        'code_presentation': pd.Categorical(['2013J', '2013J', '2013J']),
+        'date': np.array([-3, 5, 2], dtype='int16'),
+        'sum_click': np.array([4, 2, 7], dtype='int16'),
+    })
+    enrolments = pd.DataFrame({
+        'code_module': pd.Categorical(['AAA', 'AAA', 'AAA']),
+        'code_presentation': pd.Categorical(['2013J', '2013J', '2013J']),
+        'id_student': np.array([3, 1, 2], dtype='int32'),
+    })
+    daily = DailyClicks.from_clicks(clicks, enrolments)
+    features = daily.features(7)
+    assert len(daily) == 3
+    assert features['id_student'].tolist() == [3, 1, 2]
+    assert features['clicks_to_cutoff'].tolist() == [0, 6, 7]
+    assert features['active_days_last_14d'].tolist() == [0, 2, 1]
+    no_clicks = features.iloc[0].drop(['id_student', 'code_module', 'code_presentation'])
+    assert (no_clicks.drop('days_since_last_click') == 0).all()
+    assert np.isnan(no_clicks['days_since_last_click'])
+    assert features['days_since_last_click'].tolist()[1:] == [2, 5]